@@ -3,6 +3,7 @@ OneFlow API Feasibility Assistant - Main Streamlit Application
 """
 import streamlit as st
 import os
+import time
 from dotenv import load_dotenv
 from components.api_docs_processor import APIDocsProcessor
 from components.feasibility_analyzer import FeasibilityAnalyzer
@@ -19,6 +20,10 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
+# Number of most recent conversation turns rendered by default
+RECENT_TURNS = 10
+
+
 def initialize_app():
     """Initialize the application and load necessary components"""
     if 'api_processor' not in st.session_state:
@@ -26,6 +31,7 @@ def initialize_app():
 
     if 'feasibility_analyzer' not in st.session_state:
         st.session_state.feasibility_analyzer = FeasibilityAnalyzer()
+        st.session_state.capabilities_count = len(st.session_state.feasibility_analyzer.list_capabilities())
 
     if 'response_generator' not in st.session_state:
         st.session_state.response_generator = ResponseGenerator()
@@ -52,10 +58,21 @@ def main():
 
         # API Status
         st.subheader("API Status")
-        if st.button("Refresh API Documentation"):
-            with st.spinner("Refreshing API documentation..."):
-                st.session_state.api_processor.refresh_cache()
-            st.success("Documentation refreshed!")
+        refresh_future = st.session_state.get('refresh_future')
+        if st.button("Refresh API Documentation", disabled=refresh_future is not None):
+            refresh_future = st.session_state.api_processor.start_refresh()
+            st.session_state.refresh_future = refresh_future
+
+        if refresh_future is not None:
+            if refresh_future.done():
+                del st.session_state.refresh_future
+                try:
+                    st.session_state.api_processor.complete_refresh(refresh_future)
+                    st.success("Documentation refreshed!")
+                except Exception as e:
+                    st.error(f"Could not refresh documentation: {e}")
+            else:
+                st.info("Refreshing API documentation in the background...")
 
         # Show capabilities info
         if hasattr(st.session_state.api_processor, 'knowledge_base'):
@@ -64,8 +81,7 @@ def main():
                 st.metric("Available Endpoints", len(kb['endpoints']))
 
         # Show business capabilities
-        capabilities = st.session_state.feasibility_analyzer.list_capabilities()
-        st.metric("Business Capabilities", len(capabilities))
+        st.metric("Business Capabilities", st.session_state.capabilities_count)
 
         st.markdown("---")
 
@@ -141,27 +157,54 @@ def main():
     # Chat interface - DISPLAY AFTER PROCESSING
     st.markdown("---")
 
-    # Display conversation history
-    for i, (question, response) in enumerate(st.session_state.conversation_history):
-        with st.container():
-            st.markdown(f"**🔍 Question:** {question}")
-            st.markdown(response)
-            st.markdown("---")
+    # Display conversation history; only the latest turns are rendered by
+    # default to bound the number of elements sent on every rerun
+    history = st.session_state.conversation_history
+    earlier_turns = history[:-RECENT_TURNS]
+    if earlier_turns and st.checkbox(f"Show {len(earlier_turns)} earlier questions"):
+        for question, response in earlier_turns:
+            render_turn(question, response)
+
+    for question, response in history[-RECENT_TURNS:]:
+        render_turn(question, response)
+
+    # Poll the background refresh until it finishes
+    if 'refresh_future' in st.session_state:
+        time.sleep(1)
+        st.rerun()
+
+
+def render_turn(question: str, response: str):
+    """Render one question/response pair as chat messages"""
+    with st.chat_message("user"):
+        st.markdown(question)
+    with st.chat_message("assistant"):
+        st.markdown(response)
 
 
 def process_feasibility_question(question: str) -> str:
     """Process a feasibility question and return a formatted response"""
     try:
-        # Analyze feasibility
-        assessment = st.session_state.feasibility_analyzer.assess_feasibility(question)
+        # Repeat questions are answered from the analyzer's assessment cache;
+        # formatting the response is cheap, so it is not cached separately
+        response_generator = st.session_state.response_generator
+        placeholder = st.empty()
+
+        def render_preview(partial: dict):
+            placeholder.markdown('\n\n'.join(
+                response_generator.iter_response(partial, question, partial=True)
+            ))
+
+        assessment = st.session_state.feasibility_analyzer.assess_feasibility(
+            question, on_progress=render_preview
+        )
+        placeholder.empty()
 
         if not assessment:
             return "I couldn't analyze this question. Please try rephrasing it or check if the system is working properly."
 
         # Generate sales-friendly response
-        response = st.session_state.response_generator.generate_response(assessment, question)
-
-        return response
+        return response_generator.generate_response(assessment, question)
 
     except Exception as e:
         return f"Sorry, I encountered an error processing your question: {str(e)}"
@@ -3,13 +3,107 @@ API Documentation Processor
 Handles OneFlow OpenAPI specification parsing and knowledge base creation
 """
 import os
+import re
+import time
 import json
+import glob
+import pickle
+import hashlib
+import threading
 import yaml
+from sys import intern
 import requests
-from typing import Dict, Any, List, Optional
-from datetime import datetime, timedelta
+from typing import Dict, Any, List, Optional, Tuple
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import datetime
+from functools import cached_property
+from pathlib import Path
 import streamlit as st
 
+try:
+    from yaml import CSafeLoader as _YAML_LOADER
+except ImportError:
+    from yaml import SafeLoader as _YAML_LOADER
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+_HTTP_METHODS = frozenset(('GET', 'POST', 'PUT', 'DELETE', 'PATCH'))
+
+# Operation count above which endpoint extraction uses a process pool
+_PARALLEL_EXTRACT_MIN_OPERATIONS = 5000
+
+# Single worker so concurrent refresh requests never download in parallel
+_refresh_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='kb-refresh')
+
+# Messages raised on the refresh worker, which has no Streamlit script context;
+# they are shown by complete_refresh on the script thread
+_worker_messages = threading.local()
+
+# Tag substring -> workflow category, checked in priority order
+_TAG_CATEGORY_PATTERNS = (
+    ('account', 'authentication_setup'),
+    ('user', 'user_management'),
+    ('template', 'template_management'),
+    ('contact', 'contact_management'),
+    ('contract', None),  # Sub-categorized by path
+    ('webhook', 'integration_automation'),
+)
+# (path substring, required method or None, prerequisites, follow-ups)
+_WORKFLOW_RULES = (
+    # Contract creation needs templates and account info; then add parties, files, publish
+    ('/contracts/create', None,
+     ('GET /templates', 'GET /accounts/me'),
+     ('POST /contracts/{id}/parties', 'POST /contracts/{id}/files', 'POST /contracts/{id}/publish')),
+    # Adding parties needs the contract; then add participants and publish
+    ('/parties', 'POST',
+     ('POST /contracts/create',),
+     ('POST /contracts/{id}/parties/{party_id}/participants', 'POST /contracts/{id}/publish')),
+    # Adding participants needs the party to exist
+    ('/participants', 'POST',
+     ('POST /contracts/create', 'POST /contracts/{id}/parties'),
+     ()),
+)
+
+_TAG_CATEGORY_RE = re.compile('|'.join(needle for needle, _ in _TAG_CATEGORY_PATTERNS))
+
+
+def _notify(level: str, message: str):
+    """Show a Streamlit message, or queue it when running on the refresh worker"""
+    queue = getattr(_worker_messages, 'queue', None)
+    if queue is None:
+        getattr(st, level)(message)
+    else:
+        queue.append((level, message))
+
+
+def _read_json(path: str) -> Any:
+    """Read a JSON file, using orjson when installed"""
+    if orjson is not None:
+        with open(path, 'rb') as f:
+            return orjson.loads(f.read())
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def _write_json(path: str, data: Any):
+    """Write a compact JSON file, using orjson when installed"""
+    if orjson is not None:
+        # Spec dicts carry int keys (e.g. response codes), which stdlib json stringifies
+        with open(path, 'wb') as f:
+            f.write(orjson.dumps(data, default=str, option=orjson.OPT_NON_STR_KEYS))
+        return
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, separators=(',', ':'), default=str)
+
+
+@st.cache_resource(show_spinner=False)
+def _cached_load_kb(path: str, mtime: float) -> Dict[str, Any]:
+    """Parse the knowledge base file once per (path, mtime), shared by all sessions"""
+    return _read_json(path)
+
 
 class APIDocsProcessor:
     """Processes and caches OneFlow API documentation"""
@@ -19,7 +113,10 @@ class APIDocsProcessor:
                                       'https://api.oneflow.com/static/papi/version_1.yml')
         self.cache_dir = 'data'
         self.spec_file = os.path.join(self.cache_dir, 'oneflow_api_spec.yml')
+        self.spec_meta_file = os.path.join(self.cache_dir, 'spec.meta.json')
         self.knowledge_base_file = os.path.join(self.cache_dir, 'knowledge_base.json')
+        self._kb_path = Path(self.knowledge_base_file)
+        self.schemas_file = os.path.join(self.cache_dir, 'schemas.json')
         self.cache_refresh_hours = int(os.getenv('CACHE_REFRESH_HOURS', '24'))
 
         # Ensure data directory exists
@@ -30,167 +127,310 @@ class APIDocsProcessor:
 
     def _load_or_create_knowledge_base(self) -> Dict[str, Any]:
         """Load existing knowledge base or create a new one"""
-        if self._should_refresh_cache():
+        kb_mtime = self.get_knowledge_base_mtime()
+        if self._should_refresh_cache(kb_mtime):
             return self._create_knowledge_base()
 
         # Try to load existing knowledge base
-        if os.path.exists(self.knowledge_base_file):
+        try:
+            data = _cached_load_kb(self.knowledge_base_file, kb_mtime)
+            st.success(f"Loaded cached knowledge base with {len(data.get('endpoints', {}))} endpoints")
+            return data
+        except Exception as e:
+            st.warning(f"Could not load cached knowledge base: {e}")
+            # Delete corrupted cache file
             try:
-                with open(self.knowledge_base_file, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                    st.success(f"Loaded cached knowledge base with {len(data.get('endpoints', {}))} endpoints")
-                    return data
-            except Exception as e:
-                st.warning(f"Could not load cached knowledge base: {e}")
-                # Delete corrupted cache file
-                try:
-                    os.remove(self.knowledge_base_file)
-                except:
-                    pass
+                os.remove(self.knowledge_base_file)
+            except:
+                pass
 
         # Create new knowledge base if loading failed
         return self._create_knowledge_base()
 
-    def _should_refresh_cache(self) -> bool:
+    def get_knowledge_base_mtime(self) -> Optional[float]:
+        """Get the knowledge base file mtime with a single stat, or None if missing"""
+        try:
+            return self._kb_path.stat().st_mtime
+        except FileNotFoundError:
+            return None
+
+    def _should_refresh_cache(self, kb_mtime: Optional[float]) -> bool:
         """Check if cache should be refreshed"""
-        if not os.path.exists(self.knowledge_base_file):
+        if kb_mtime is None:
             return True
 
         # Check file age
-        file_age = datetime.now() - datetime.fromtimestamp(
-            os.path.getmtime(self.knowledge_base_file)
-        )
-
-        return file_age > timedelta(hours=self.cache_refresh_hours)
+        return time.time() - kb_mtime > self.cache_refresh_hours * 3600
 
     def _create_knowledge_base(self) -> Dict[str, Any]:
         """Create knowledge base from OneFlow API specification"""
         try:
-            # Download or load API specification
-            api_spec = self._get_api_specification()
-
-            if not api_spec:
-                return self._get_fallback_knowledge_base()
-
-            # Process the specification
-            knowledge_base = {
-                'metadata': {
-                    'created_at': datetime.now().isoformat(),
-                    'api_version': api_spec.get('info', {}).get('version', 'unknown'),
-                    'title': api_spec.get('info', {}).get('title', 'OneFlow API')
-                },
-                'endpoints': self._extract_endpoints(api_spec),
-                'workflows': self._define_workflows(),
-                'schemas': self._extract_schemas(api_spec)
-            }
-
-            # Save knowledge base (with datetime serialization fix)
-            with open(self.knowledge_base_file, 'w') as f:
-                json.dump(knowledge_base, f, indent=2, default=str)
-
-            return knowledge_base
+            return self._build_knowledge_base()
 
         except Exception as e:
             st.error(f"Error creating knowledge base: {e}")
             return self._get_fallback_knowledge_base()
 
-    def _get_api_specification(self) -> Optional[Dict[str, Any]]:
+    def _build_knowledge_base(self, force_download: bool = False) -> Dict[str, Any]:
+        """Build the knowledge base from the API specification, raising if none is available"""
+        # Download or load API specification
+        api_spec = self._get_api_specification(force_download)
+
+        if not api_spec:
+            raise RuntimeError("No API specification could be downloaded or loaded")
+
+        # Unchanged specification: keep the existing knowledge base and reset its TTL
+        previous = self._get_previous_knowledge_base()
+        if (self._spec_digest and os.path.exists(self.schemas_file) and
+                previous.get('metadata', {}).get('source_hash') == self._spec_digest):
+            if os.path.exists(self.knowledge_base_file):
+                os.utime(self.knowledge_base_file, None)
+            else:
+                _write_json(self.knowledge_base_file, previous)
+            return previous
+
+        # Process the specification
+        knowledge_base = {
+            'metadata': {
+                'created_at': datetime.now().isoformat(),
+                'api_version': api_spec.get('info', {}).get('version', 'unknown'),
+                'title': api_spec.get('info', {}).get('title', 'OneFlow API'),
+                'source_hash': self._spec_digest
+            },
+            'endpoints': self._extract_endpoints(api_spec),
+            'workflows': self._define_workflows()
+        }
+
+        # Schemas are the bulk of the spec but rarely read, so they live
+        # in their own file and are only loaded through `schemas`
+        _write_json(self.schemas_file, self._extract_schemas(api_spec))
+        self.__dict__.pop('schemas', None)
+
+        # Save knowledge base (with datetime serialization fix)
+        _write_json(self.knowledge_base_file, knowledge_base)
+
+        return knowledge_base
+
+    def _get_previous_knowledge_base(self) -> Dict[str, Any]:
+        """Get the knowledge base currently in memory or on disk, if any"""
+        if getattr(self, 'knowledge_base', None):
+            return self.knowledge_base
+
+        kb_mtime = self.get_knowledge_base_mtime()
+        if kb_mtime is not None:
+            try:
+                return _cached_load_kb(self.knowledge_base_file, kb_mtime)
+            except Exception:
+                pass
+
+        return {}
+
+    def _get_api_specification(self, force_download: bool = False) -> Optional[Dict[str, Any]]:
         """Download and parse OneFlow API specification"""
+        spec_meta = self._load_spec_meta()
+        self._spec_digest = None
+
         try:
-            # Try to download fresh specification
-            response = requests.get(self.api_spec_url, timeout=30)
-            response.raise_for_status()
+            # Only ask for changes when we still have the previous download
+            headers = {}
+            if not force_download and spec_meta and os.path.exists(self.spec_file):
+                if spec_meta.get('etag'):
+                    headers['If-None-Match'] = spec_meta['etag']
+                if spec_meta.get('last_modified'):
+                    headers['If-Modified-Since'] = spec_meta['last_modified']
 
-            # Save the specification
-            with open(self.spec_file, 'w') as f:
-                f.write(response.text)
+            # Try to download fresh specification
+            with requests.get(self.api_spec_url, headers=headers, timeout=30, stream=True) as response:
+                if response.status_code == 304:
+                    api_spec = self._load_cached_spec(spec_meta.get('digest'))
+                    self._spec_digest = spec_meta.get('digest')
+                    return api_spec
+
+                response.raise_for_status()
+
+                # Stream the body to disk, hashing as we go, so the full
+                # payload is never held in memory alongside the parsed spec
+                sha1 = hashlib.sha1()
+                partial_file = f'{self.spec_file}.part'
+                with open(partial_file, 'wb') as f:
+                    for chunk in response.iter_content(chunk_size=65536):
+                        sha1.update(chunk)
+                        f.write(chunk)
+                os.replace(partial_file, self.spec_file)
+
+            digest = sha1.hexdigest()
+            self._save_spec_meta({
+                'etag': response.headers.get('ETag'),
+                'last_modified': response.headers.get('Last-Modified'),
+                'digest': digest
+            })
 
-            # Parse YAML
-            return yaml.safe_load(response.text)
+            api_spec = self._parse_spec(digest)
+            self._spec_digest = digest
+            return api_spec
 
         except Exception as e:
-            st.warning(f"Could not download API specification: {e}")
+            _notify('warning', f"Could not download API specification: {e}")
 
             # Try to load cached version
             if os.path.exists(self.spec_file):
                 try:
-                    with open(self.spec_file, 'r') as f:
-                        return yaml.safe_load(f)
+                    api_spec = self._load_cached_spec(spec_meta.get('digest'))
+                    self._spec_digest = spec_meta.get('digest')
+                    return api_spec
                 except Exception as e2:
-                    st.error(f"Could not load cached specification: {e2}")
+                    _notify('error', f"Could not load cached specification: {e2}")
+
+            return None
+
+    def _load_spec_meta(self) -> Dict[str, Any]:
+        """Load ETag/Last-Modified/digest of the last downloaded specification"""
+        if not os.path.exists(self.spec_meta_file):
+            return {}
+        try:
+            return _read_json(self.spec_meta_file)
+        except Exception:
+            return {}
+
+    def _save_spec_meta(self, spec_meta: Dict[str, Any]):
+        """Persist ETag/Last-Modified/digest of the downloaded specification"""
+        try:
+            _write_json(self.spec_meta_file, spec_meta)
+        except Exception as e:
+            _notify('warning', f"Could not save specification metadata: {e}")
+
+    def _spec_pickle_file(self, digest: str) -> str:
+        """Path of the pickled parse for a specification digest"""
+        return os.path.join(self.cache_dir, f'spec_{digest}.pkl')
 
+    def _load_spec_pickle(self, digest: Optional[str]) -> Optional[Dict[str, Any]]:
+        """Load a pickled specification parse, if one exists for the digest"""
+        if not digest:
             return None
 
+        pickle_file = self._spec_pickle_file(digest)
+        if os.path.exists(pickle_file):
+            try:
+                with open(pickle_file, 'rb') as f:
+                    return pickle.load(f)
+            except Exception:
+                pass  # Corrupted pickle, caller re-parses
+
+        return None
+
+    def _load_cached_spec(self, digest: Optional[str] = None) -> Dict[str, Any]:
+        """Load the previously downloaded specification"""
+        api_spec = self._load_spec_pickle(digest)
+        if api_spec is not None:
+            return api_spec
+
+        with open(self.spec_file, 'rb') as f:
+            return yaml.load(f, Loader=_YAML_LOADER)
+
+    def _parse_spec(self, digest: str) -> Dict[str, Any]:
+        """Parse the downloaded specification, reusing a pickled parse of identical content"""
+        api_spec = self._load_spec_pickle(digest)
+        if api_spec is not None:
+            return api_spec
+
+        # Parse YAML straight from the file handle (libyaml-backed loader when available)
+        with open(self.spec_file, 'rb') as f:
+            api_spec = yaml.load(f, Loader=_YAML_LOADER)
+
+        try:
+            # Only the latest spec version is worth keeping
+            for stale_file in glob.glob(os.path.join(self.cache_dir, 'spec_*.pkl')):
+                os.remove(stale_file)
+            with open(self._spec_pickle_file(digest), 'wb') as f:
+                pickle.dump(api_spec, f, protocol=pickle.HIGHEST_PROTOCOL)
+        except Exception as e:
+            _notify('warning', f"Could not cache parsed specification: {e}")
+
+        return api_spec
+
     def _extract_endpoints(self, api_spec: Dict[str, Any]) -> Dict[str, Any]:
         """Extract and categorize endpoints from API specification"""
-        endpoints = {}
         paths = api_spec.get('paths', {})
+        valid_methods = _HTTP_METHODS
 
+        operations = []
         for path, path_info in paths.items():
             for method, method_info in path_info.items():
-                if method.upper() in ['GET', 'POST', 'PUT', 'DELETE', 'PATCH']:
-                    endpoint_key = f"{method.upper()} {path}"
-
-                    endpoints[endpoint_key] = {
-                        'path': path,
-                        'method': method.upper(),
-                        'summary': method_info.get('summary', ''),
-                        'description': method_info.get('description', ''),
-                        'operationId': method_info.get('operationId', ''),
-                        'tags': method_info.get('tags', []),
-                        'parameters': self._extract_parameters(method_info),
-                        'request_body': self._extract_request_body(method_info),
-                        'responses': self._extract_responses(method_info),
-                        'workflow_category': self._categorize_endpoint(path, method_info),
-                        'prerequisites': self._identify_prerequisites(path, method),
-                        'follow_ups': self._identify_follow_ups(path, method)
-                    }
-
-        return endpoints
-
-    def _extract_parameters(self, method_info: Dict[str, Any]) -> List[Dict[str, Any]]:
-        """Extract parameters from method info"""
-        parameters = []
-        for param in method_info.get('parameters', []):
-            parameters.append({
+                method_upper = intern(method.upper())
+                if method_upper in valid_methods:
+                    operations.append((path, method_upper, method_info))
+
+        # Rows are independent; only specs large enough to amortize process
+        # start-up and pickling are spread across cores
+        if len(operations) >= _PARALLEL_EXTRACT_MIN_OPERATIONS:
+            with ProcessPoolExecutor() as executor:
+                rows = list(executor.map(self._build_endpoint, *zip(*operations), chunksize=64))
+        else:
+            rows = [self._build_endpoint(*operation) for operation in operations]
+
+        return {f"{row['method']} {row['path']}": row for row in rows}
+
+    @staticmethod
+    def _build_endpoint(path: str, method: str, method_info: Dict[str, Any]) -> Dict[str, Any]:
+        """Build the knowledge base entry for a single operation"""
+        mget = method_info.get
+        request_body = mget('requestBody')
+        if request_body:
+            request_body = {
+                'description': request_body.get('description', ''),
+                'required': request_body.get('required', False),
+                'content': request_body.get('content', {})
+            }
+        else:
+            request_body = None
+
+        prerequisites, follow_ups = APIDocsProcessor._identify_related_endpoints(path, method)
+
+        return {
+            'path': path,
+            'method': method,
+            'summary': mget('summary', ''),
+            'description': mget('description', ''),
+            'operationId': mget('operationId', ''),
+            'tags': [intern(tag) for tag in mget('tags', [])],
+            'parameters': APIDocsProcessor._extract_parameters(mget('parameters', [])),
+            'request_body': request_body,
+            'responses': mget('responses', {}),
+            'workflow_category': APIDocsProcessor._categorize_endpoint(path, method_info),
+            'prerequisites': prerequisites,
+            'follow_ups': follow_ups
+        }
+
+    @staticmethod
+    def _extract_parameters(params: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Extract parameters from a method's parameter list"""
+        return [
+            {
                 'name': param.get('name', ''),
-                'in': param.get('in', ''),
+                'in': intern(param.get('in', '')),
                 'required': param.get('required', False),
                 'description': param.get('description', ''),
                 'schema': param.get('schema', {}),
                 'example': param.get('example', '')
-            })
-        return parameters
-
-    def _extract_request_body(self, method_info: Dict[str, Any]) -> Optional[Dict[str, Any]]:
-        """Extract request body information"""
-        request_body = method_info.get('requestBody')
-        if not request_body:
-            return None
+            }
+            for param in params
+        ]
 
-        return {
-            'description': request_body.get('description', ''),
-            'required': request_body.get('required', False),
-            'content': request_body.get('content', {})
-        }
+    @staticmethod
+    def _categorize_endpoint(path: str, method_info: Dict[str, Any]) -> str:
+        """Categorize endpoint based on path and tags"""
+        # One regex pass finds every needle; the table then applies priority
+        matched = set(_TAG_CATEGORY_RE.findall(' '.join(method_info.get('tags', [])).lower()))
+        if not matched:
+            return 'general'
 
-    def _extract_responses(self, method_info: Dict[str, Any]) -> Dict[str, Any]:
-        """Extract response information"""
-        return method_info.get('responses', {})
+        for needle, category in _TAG_CATEGORY_PATTERNS:
+            if needle not in matched:
+                continue
+            if category is not None:
+                return category
 
-    def _categorize_endpoint(self, path: str, method_info: Dict[str, Any]) -> str:
-        """Categorize endpoint based on path and tags"""
-        tags = method_info.get('tags', [])
-
-        if any('account' in tag.lower() for tag in tags):
-            return 'authentication_setup'
-        elif any('user' in tag.lower() for tag in tags):
-            return 'user_management'
-        elif any('template' in tag.lower() for tag in tags):
-            return 'template_management'
-        elif any('contact' in tag.lower() for tag in tags):
-            return 'contact_management'
-        elif any('contract' in tag.lower() for tag in tags):
+            # Contract endpoints are split further by path
             if 'parties' in path or 'participants' in path:
                 return 'contract_parties'
             elif 'files' in path:
@@ -199,55 +439,38 @@ class APIDocsProcessor:
                 return 'contract_publishing'
             else:
                 return 'contract_management'
-        elif any('webhook' in tag.lower() for tag in tags):
-            return 'integration_automation'
-        else:
-            return 'general'
-
-    def _identify_prerequisites(self, path: str, method: str) -> List[str]:
-        """Identify prerequisite endpoints for this endpoint"""
-        prerequisites = []
-
-        # Contract creation needs templates and account info
-        if '/contracts/create' in path:
-            prerequisites.extend(['GET /templates', 'GET /accounts/me'])
-
-        # Adding parties needs contract to exist
-        if '/parties' in path and method == 'POST':
-            prerequisites.append('POST /contracts/create')
 
-        # Adding participants needs party to exist
-        if '/participants' in path and method == 'POST':
-            prerequisites.extend(['POST /contracts/create', 'POST /contracts/{id}/parties'])
+        return 'general'
 
-        return prerequisites
-
-    def _identify_follow_ups(self, path: str, method: str) -> List[str]:
-        """Identify logical follow-up endpoints"""
+    @staticmethod
+    def _identify_related_endpoints(path: str, method: str) -> Tuple[List[str], List[str]]:
+        """Identify prerequisite and logical follow-up endpoints in one pass"""
+        prerequisites = []
         follow_ups = []
 
-        # After creating contract, suggest adding parties
-        if '/contracts/create' in path:
-            follow_ups.extend([
-                'POST /contracts/{id}/parties',
-                'POST /contracts/{id}/files',
-                'POST /contracts/{id}/publish'
-            ])
-
-        # After adding parties, suggest adding participants
-        if '/parties' in path and method == 'POST':
-            follow_ups.extend([
-                'POST /contracts/{id}/parties/{party_id}/participants',
-                'POST /contracts/{id}/publish'
-            ])
+        for needle, method_filter, rule_prerequisites, rule_follow_ups in _WORKFLOW_RULES:
+            if needle in path and (method_filter is None or method == method_filter):
+                prerequisites.extend(rule_prerequisites)
+                follow_ups.extend(rule_follow_ups)
 
-        return follow_ups
+        return prerequisites, follow_ups
 
     def _extract_schemas(self, api_spec: Dict[str, Any]) -> Dict[str, Any]:
         """Extract schema definitions"""
         components = api_spec.get('components', {})
         return components.get('schemas', {})
 
+    @cached_property
+    def schemas(self) -> Dict[str, Any]:
+        """Schema definitions, loaded from disk on first access"""
+        if not os.path.exists(self.schemas_file):
+            return {}
+        try:
+            return _read_json(self.schemas_file)
+        except Exception as e:
+            st.warning(f"Could not load schema definitions: {e}")
+            return {}
+
     def _define_workflows(self) -> Dict[str, Any]:
         """Define common workflow patterns"""
         return {
@@ -313,18 +536,52 @@ class APIDocsProcessor:
                     'workflow_category': 'authentication_setup'
                 }
             },
-            'workflows': self._define_workflows(),
-            'schemas': {}
+            'workflows': self._define_workflows()
         }
 
     def refresh_cache(self):
         """Force refresh of cached data"""
-        if os.path.exists(self.knowledge_base_file):
-            os.remove(self.knowledge_base_file)
-        if os.path.exists(self.spec_file):
-            os.remove(self.spec_file)
+        self.complete_refresh(self.start_refresh())
+
+    def start_refresh(self) -> Future:
+        """Start a forced refresh on a background worker
+
+        Returns a Future resolving to the new knowledge base (or None) and the
+        worker's messages; hand it to complete_refresh from the script thread
+        once it is done.
+        """
+        return _refresh_executor.submit(self._rebuild_knowledge_base)
+
+    def complete_refresh(self, future: Future):
+        """Show the refresh's messages and swap in its knowledge base
+
+        Raises RuntimeError if the refresh failed; the current knowledge base is kept.
+        """
+        knowledge_base, messages = future.result()
+        for level, message in messages:
+            getattr(st, level)(message)
+
+        if knowledge_base is None:
+            raise RuntimeError("the current knowledge base was kept")
+
+        self.knowledge_base = knowledge_base
+
+    def _rebuild_knowledge_base(self) -> Tuple[Optional[Dict[str, Any]], List[Tuple[str, str]]]:
+        """Re-download the spec and rebuild the knowledge base, collecting messages for the script thread"""
+        _worker_messages.queue = messages = []
+        try:
+            # The spec and knowledge base files are kept, so a failed download falls
+            # back to the cached spec and an unchanged spec skips regeneration
+            knowledge_base = self._build_knowledge_base(force_download=True)
+            _cached_load_kb.clear()
+            return knowledge_base, messages
+
+        except Exception as e:
+            messages.append(('error', f"Error creating knowledge base: {e}"))
+            return None, messages
 
-        self.knowledge_base = self._create_knowledge_base()
+        finally:
+            del _worker_messages.queue
 
     def search_endpoints(self, query: str) -> List[Dict[str, Any]]:
         """Search endpoints by query"""
@@ -333,9 +590,9 @@ class APIDocsProcessor:
 
         for endpoint_key, endpoint_info in self.knowledge_base.get('endpoints', {}).items():
             # Search in summary, description, and path
-            if (query_lower in endpoint_info.get('summary', '').lower() or
-                    query_lower in endpoint_info.get('description', '').lower() or
-                    query_lower in endpoint_info.get('path', '').lower()):
+            if (query_lower in (endpoint_info.get('summary') or '').lower() or
+                    query_lower in (endpoint_info.get('description') or '').lower() or
+                    query_lower in (endpoint_info.get('path') or '').lower()):
                 results.append({
                     'endpoint': endpoint_key,
                     'info': endpoint_info
@@ -3,16 +3,145 @@ Feasibility Analyzer
 Processes sales questions using OpenAI to assess OneFlow API feasibility
 """
 import os
-import json
-from typing import Dict, Any, List, Optional
-from openai import OpenAI
+import re
+import copy
+import time
+import random
+import threading
+from collections import OrderedDict
+from itertools import islice
+from typing import Callable, Dict, Any, List, Optional, Tuple
+import httpx
+from openai import APIConnectionError, APITimeoutError, InternalServerError, OpenAI, RateLimitError
 import streamlit as st
 
+from .response_generator import STANDARD_IMPACT
+
+try:
+    from orjson import loads as _json_loads
+except ImportError:
+    from json import loads as _json_loads
+
+# JSON payload in a model reply: a ```json fenced block wins, else the outermost braces
+_JSON_RE = re.compile(r"\A(?:.*?```json\s*(.*?)\s*```|.*?(\{.*\}))", re.S)
+
+# Fallback keyword matchers; substring semantics, so "contracts" still hits "contract"
+_CREATE_KEYWORDS_RE = re.compile('create|contract|template')
+_FILE_KEYWORDS_RE = re.compile('pdf|file|attach|upload')
+
+# Number of streamed chunks between progress callbacks
+STREAM_RENDER_EVERY = 8
+
+# Retries on 429s, connection errors and 5xx, with exponential backoff and jitter
+# between OPENAI_RETRY_BASE_DELAY and OPENAI_RETRY_MAX_DELAY seconds. Timeouts are
+# not retried, since each attempt already waits up to 15s, and bad requests never are
+OPENAI_MAX_RETRIES = 4
+OPENAI_RETRY_BASE_DELAY = 0.5
+OPENAI_RETRY_MAX_DELAY = 8.0
+
+_RETRYABLE_ERRORS = (RateLimitError, APIConnectionError, InternalServerError)
+
+# Assessments kept per (model, normalized question), shared by every session;
+# least recently used evicted first, entries expire after ASSESSMENT_CACHE_TTL seconds
+ASSESSMENT_CACHE_SIZE = 512
+ASSESSMENT_CACHE_TTL = 86400
+
+_assessment_cache: "OrderedDict[Tuple[str, str], Tuple[float, Dict[str, Any]]]" = OrderedDict()
+_assessment_cache_lock = threading.Lock()
+
+
+@st.cache_resource(show_spinner=False)
+def get_openai_client() -> OpenAI:
+    """Shared OpenAI client whose connection pool is reused across sessions and reruns"""
+    # Retries are done by _create_with_retries, which can leave timeouts out
+    return OpenAI(
+        api_key=os.getenv('OPENAI_API_KEY'),
+        max_retries=0,
+        http_client=httpx.Client(
+            limits=httpx.Limits(max_connections=100, max_keepalive_connections=20),
+            timeout=15
+        )
+    )
+
+
+def _create_with_retries(create: Callable[..., Any], **kwargs) -> Any:
+    """Call a chat completions create, retrying transient errors with exponential backoff"""
+    for attempt in range(OPENAI_MAX_RETRIES + 1):
+        try:
+            return create(**kwargs)
+        except APITimeoutError:
+            raise
+        except _RETRYABLE_ERRORS:
+            if attempt == OPENAI_MAX_RETRIES:
+                raise
+            delay = min(OPENAI_RETRY_MAX_DELAY, OPENAI_RETRY_BASE_DELAY * 2 ** attempt)
+            time.sleep(delay * random.uniform(0.5, 1.0))
+
+
+def completed_fields(buffer: str) -> Dict[str, Any]:
+    """Top-level fields of a streamed JSON object that have fully arrived"""
+    depth = 0
+    in_string = escaped = False
+    end = 0
+    for i, ch in enumerate(buffer):
+        if in_string:
+            if escaped:
+                escaped = False
+            elif ch == '\\':
+                escaped = True
+            elif ch == '"':
+                in_string = False
+        elif ch == '"':
+            in_string = True
+        elif ch in '{[':
+            depth += 1
+        elif ch in '}]':
+            depth -= 1
+        elif ch == ',' and depth == 1:
+            end = i
+
+    if not end:
+        return {}
+    try:
+        parsed = _json_loads(buffer[:end] + '}')
+    except ValueError:
+        return {}
+    return parsed if isinstance(parsed, dict) else {}
+
+
+def normalize_question(question: str) -> str:
+    """Normalize case and whitespace so trivially different questions share a cache entry"""
+    return ' '.join(question.lower().split())
+
+
+def _cached_assessment(key: Tuple[str, str]) -> Optional[Dict[str, Any]]:
+    """Copy of a cached, unexpired assessment, or None"""
+    with _assessment_cache_lock:
+        entry = _assessment_cache.get(key)
+        if entry is None:
+            return None
+        if time.monotonic() - entry[0] > ASSESSMENT_CACHE_TTL:
+            del _assessment_cache[key]
+            return None
+        _assessment_cache.move_to_end(key)
+    return copy.deepcopy(entry[1])
+
+
+def _store_assessment(key: Tuple[str, str], assessment: Dict[str, Any]):
+    """Cache a copy of an assessment, evicting the least recently used beyond ASSESSMENT_CACHE_SIZE"""
+    with _assessment_cache_lock:
+        _assessment_cache[key] = (time.monotonic(), copy.deepcopy(assessment))
+        _assessment_cache.move_to_end(key)
+        if len(_assessment_cache) > ASSESSMENT_CACHE_SIZE:
+            _assessment_cache.popitem(last=False)
+
+
 class FeasibilityAnalyzer:
     """Analyzes sales questions and assesses technical feasibility using OneFlow API"""
 
+    __slots__ = ('model', 'business_capabilities', '_system_prompt', '_assessment_tools')
+
     def __init__(self):
-        self.client = OpenAI(api_key=os.getenv('OPENAI_API_KEY'))
         self.model = "gpt-3.5-turbo"
 
         # Define OneFlow business capabilities
@@ -67,56 +196,96 @@ class FeasibilityAnalyzer:
             }
         }
 
-    def assess_feasibility(self, sales_question: str) -> Optional[Dict[str, Any]]:
-        """Assess technical feasibility of a sales question"""
-        try:
-            # Create the prompt for OpenAI
-            prompt = self._create_assessment_prompt(sales_question)
-
-            # Call OpenAI with timeout to prevent hanging
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=[
-                    {"role": "system", "content": self._get_system_prompt()},
-                    {"role": "user", "content": prompt}
-                ],
-                temperature=0.2,  # Lower temperature for more consistent assessments
-                max_tokens=800,
-                timeout=15
-            )
-
-            # Parse the response
-            result = self._parse_openai_response(response.choices[0].message.content)
+        # Capabilities never change after init, so the prompt and tools are built once
+        self._system_prompt = self._build_system_prompt()
+        self._assessment_tools = self._build_assessment_tools()
+
+    @property
+    def client(self) -> OpenAI:
+        """Shared OpenAI client, looked up per call so a replaced client reaches every session"""
+        return get_openai_client()
+
+    def assess_feasibility(self, sales_question: str,
+                           on_progress: Optional[Callable[[Dict[str, Any]], None]] = None
+                           ) -> Optional[Dict[str, Any]]:
+        """Assess technical feasibility of a sales question
+
+        on_progress, if given, is called with the fields completed so far while
+        the answer streams in; cached answers never call it.
+        """
+        # Plain dict cache rather than st.cache_data, so the streamed preview made
+        # through on_progress is never recorded and replayed
+        key = (self.model, normalize_question(sales_question))
+        cached = _cached_assessment(key)
+        if cached is not None:
+            return cached
 
-            return result
+        try:
+            assessment = self._request_assessment(sales_question, on_progress)
+
+        except APITimeoutError as e:
+            # A client that timed out may hold dead connections; new calls get a fresh
+            # one, and the old one is left to requests other sessions still have in
+            # flight and closed when it is garbage-collected
+            get_openai_client.clear()
+            st.warning(f"OpenAI timed out, using fallback assessment: {str(e)[:100]}")
+            return self._create_fallback_assessment(sales_question)
 
         except Exception as e:
             st.warning(f"OpenAI unavailable, using fallback assessment: {str(e)[:100]}")
             return self._create_fallback_assessment(sales_question)
 
-    def _get_system_prompt(self) -> str:
-        """Get the system prompt for OpenAI"""
-        capabilities_text = "\n".join([
-            f"- {cap}: {info['description']} (Caveats: {', '.join(info['caveats'])})"
-            for cap, info in self.business_capabilities.items()
-        ])
+        # Unstructured answers are not cached, so they are retried next time
+        if not assessment.get('fallback_used'):
+            _store_assessment(key, assessment)
 
-        return f"""You are a OneFlow API expert helping sales teams assess technical feasibility.
+        return assessment
 
-OneFlow is a contract management platform with these key capabilities:
-{capabilities_text}
+    def _request_assessment(self, sales_question: str,
+                            on_progress: Optional[Callable[[Dict[str, Any]], None]] = None
+                            ) -> Dict[str, Any]:
+        """Ask OpenAI to assess a sales question; raises when OpenAI is unavailable"""
+        # Create the prompt for OpenAI
+        prompt = self._create_assessment_prompt(sales_question)
+
+        # Call OpenAI with timeout to prevent hanging; stream so output shows up immediately
+        stream = _create_with_retries(
+            self.client.chat.completions.create,
+            model=self.model,
+            messages=[
+                {"role": "system", "content": self._get_system_prompt()},
+                {"role": "user", "content": prompt}
+            ],
+            temperature=0.2,  # Lower temperature for more consistent assessments
+            max_tokens=800,
+            timeout=15,
+            tools=self._assessment_tools,
+            tool_choice={"type": "function", "function": {"name": "assess"}},
+            stream=True
+        )
+
+        # Report finished fields as they arrive, only every few chunks
+        chunks = []
+        for chunk in stream:
+            if not chunk.choices:
+                continue
+            delta = self._delta_text(chunk.choices[0].delta)
+            if delta:
+                chunks.append(delta)
+                if on_progress is not None and len(chunks) % STREAM_RENDER_EVERY == 0:
+                    on_progress(completed_fields(''.join(chunks)))
+
+        # Parse the response
+        return self._parse_openai_response(''.join(chunks))
 
-Your job is to analyze sales questions and provide clear, business-focused feasibility assessments.
+    def _get_system_prompt(self) -> str:
+        """Get the system prompt for OpenAI"""
+        return self._system_prompt
 
-Respond in JSON format with these fields:
-- "feasibility": "Yes" | "No" | "Conditional"
-- "confidence": "High" | "Medium" | "Low"
-- "quick_answer": Brief, sales-friendly explanation
-- "capabilities_used": List of relevant OneFlow capabilities
-- "important_caveats": List of key limitations or requirements
-- "business_impact": How caveats might affect implementation or sales
-- "related_features": Other OneFlow capabilities that might be relevant
-- "follow_up_questions": Questions to better understand requirements
+    def _build_system_prompt(self) -> str:
+        """Build the system prompt; the capability catalog lives in the tool schema"""
+        return """You are a OneFlow API expert helping sales teams assess technical feasibility.
+OneFlow is a contract management platform. Always answer by calling the provided assessment tool.
 
 Guidelines:
 - Use business language, not technical jargon
@@ -125,6 +294,50 @@ Guidelines:
 - Consider implementation complexity in confidence scoring
 - Highlight caveats that could affect deal closing"""
 
+    def _build_assessment_tools(self) -> List[Dict[str, Any]]:
+        """Build the assessment tool, with capabilities as enums"""
+        capability_list = {
+            "type": "array",
+            "items": {"type": "string", "enum": list(self.business_capabilities)}
+        }
+        assessment = {
+            "type": "object",
+            "properties": {
+                "feasibility": {"type": "string", "enum": ["Yes", "No", "Conditional"]},
+                "confidence": {"type": "string", "enum": ["High", "Medium", "Low"]},
+                "quick_answer": {"type": "string", "description": "Brief, sales-friendly explanation"},
+                "capabilities_used": capability_list,
+                "important_caveats": {
+                    "type": "array", "items": {"type": "string"},
+                    "description": "Key limitations or requirements"
+                },
+                "business_impact": {
+                    "type": "string",
+                    "description": "How caveats might affect implementation or sales"
+                },
+                "related_features": capability_list,
+                "follow_up_questions": {
+                    "type": "array", "items": {"type": "string"},
+                    "description": "Questions to better understand requirements"
+                }
+            },
+            "required": [
+                "feasibility", "confidence", "quick_answer", "capabilities_used",
+                "important_caveats", "business_impact", "related_features", "follow_up_questions"
+            ]
+        }
+        return [{"type": "function",
+                 "function": {"name": "assess",
+                              "description": "Record the feasibility assessment of a sales question",
+                              "parameters": assessment}}]
+
+    @staticmethod
+    def _delta_text(delta: Any) -> Optional[str]:
+        """Text of a streamed delta: tool call arguments, or plain content"""
+        if delta.tool_calls:
+            return delta.tool_calls[0].function.arguments
+        return delta.content
+
     def _create_assessment_prompt(self, sales_question: str) -> str:
         """Create assessment prompt for sales question"""
         return f"""
@@ -144,21 +357,22 @@ Provide a structured JSON assessment.
 
     def _parse_openai_response(self, response_text: str) -> Dict[str, Any]:
         """Parse OpenAI response and extract structured data"""
+        # Forced tool calls return the arguments as a bare JSON object
         try:
-            # Try to extract JSON from the response
-            if '```json' in response_text:
-                start = response_text.find('```json') + 7
-                end = response_text.find('```', start)
-                json_text = response_text[start:end].strip()
-            elif '{' in response_text and '}' in response_text:
-                start = response_text.find('{')
-                end = response_text.rfind('}') + 1
-                json_text = response_text[start:end]
-            else:
+            parsed_response = _json_loads(response_text)
+        except ValueError:
+            parsed_response = None
+        if isinstance(parsed_response, dict):
+            return self._validate_and_enhance_assessment(parsed_response)
+
+        try:
+            # Plain-content replies may wrap the JSON in fences or prose
+            match = _JSON_RE.match(response_text)
+            if not match:
                 return self._create_fallback_from_text(response_text)
 
             # Parse the JSON
-            parsed_response = json.loads(json_text)
+            parsed_response = _json_loads(match.group(1) or match.group(2))
 
             # Validate and enhance the response
             return self._validate_and_enhance_assessment(parsed_response)
@@ -175,7 +389,7 @@ Provide a structured JSON assessment.
         assessment.setdefault('quick_answer', 'Technical assessment completed')
         assessment.setdefault('capabilities_used', [])
         assessment.setdefault('important_caveats', [])
-        assessment.setdefault('business_impact', 'Standard implementation considerations apply')
+        assessment.setdefault('business_impact', STANDARD_IMPACT)
         assessment.setdefault('related_features', [])
         assessment.setdefault('follow_up_questions', [])
 
@@ -201,7 +415,7 @@ Provide a structured JSON assessment.
         question_lower = sales_question.lower()
 
         # Simple keyword-based assessment
-        if any(word in question_lower for word in ['create', 'contract', 'template']):
+        if _CREATE_KEYWORDS_RE.search(question_lower):
             return {
                 'feasibility': 'Yes',
                 'confidence': 'High',
@@ -220,7 +434,7 @@ Provide a structured JSON assessment.
                 'confidence_reasoning': 'Core OneFlow functionality',
                 'fallback_used': True
             }
-        elif any(word in question_lower for word in ['pdf', 'file', 'attach', 'upload']):
+        elif _FILE_KEYWORDS_RE.search(question_lower):
             return {
                 'feasibility': 'Yes',
                 'confidence': 'Medium',
@@ -248,7 +462,7 @@ Provide a structured JSON assessment.
                 'capabilities_used': [],
                 'important_caveats': ['Insufficient information for detailed assessment'],
                 'business_impact': 'Cannot assess without more details',
-                'related_features': list(self.business_capabilities.keys())[:3],
+                'related_features': list(islice(self.business_capabilities, 3)),
                 'follow_up_questions': [
                     'Can you provide more specific details about what you need to accomplish?',
                     'What is the main business process you\'re trying to automate?'
@@ -259,10 +473,13 @@ Provide a structured JSON assessment.
 
     def _create_fallback_from_text(self, response_text: str) -> Dict[str, Any]:
         """Create assessment from unstructured OpenAI response"""
+        response_text = response_text.strip()
+        quick_answer = response_text if len(response_text) <= 200 else f"{response_text[:200]}..."
+
         return {
             'feasibility': 'Conditional',
             'confidence': 'Medium',
-            'quick_answer': response_text[:200] + '...' if len(response_text) > 200 else response_text,
+            'quick_answer': quick_answer,
             'capabilities_used': [],
             'important_caveats': ['Assessment based on unstructured analysis'],
             'business_impact': 'Manual review recommended',
@@ -2,59 +2,128 @@
 Response Generator
 Creates sales-friendly responses from feasibility assessments
 """
-from typing import Dict, Any, List
+from string import Template
+from typing import Dict, Any, Iterator, List
 from datetime import datetime
 
-class ResponseGenerator:
-    """Generates sales-friendly responses from feasibility assessments"""
+# Default business impact; sections equal to it are left out of the response
+STANDARD_IMPACT = 'Standard implementation considerations apply'
 
-    def __init__(self):
-        self.confidence_emojis = {
-            'High': '🟢',
-            'Medium': '🟡',
-            'Low': '🔴'
-        }
+_EMAIL_TEMPLATE = Template("""OneFlow API Feasibility Assessment
 
-        self.feasibility_emojis = {
-            'Yes': '✅',
-            'No': '❌',
-            'Conditional': '⚠️'
-        }
+Question: $question
 
-    def generate_response(self, assessment: Dict[str, Any], original_question: str) -> str:
-        """Generate a complete sales response from assessment"""
-        try:
-            response_parts = []
+Assessment: $feasibility (Confidence: $confidence)
 
-            # Header with quick answer
-            response_parts.append(self._create_header(assessment, original_question))
+Summary: $quick_answer
 
-            # Main explanation
-            response_parts.append(self._create_explanation(assessment))
+Key Considerations:
+$key_caveats
 
-            # Important caveats (if any)
-            if assessment.get('important_caveats'):
-                response_parts.append(self._create_caveats_section(assessment))
+Business Impact: $business_impact
 
-            # Business impact
-            response_parts.append(self._create_business_impact(assessment))
+Generated: $timestamp
+Assessment Method: $assessment_method
+""")
 
-            # Related features (if any)
-            if assessment.get('related_features'):
-                response_parts.append(self._create_related_features(assessment))
 
-            # Follow-up questions (if any)
-            if assessment.get('follow_up_questions'):
-                response_parts.append(self._create_follow_up_section(assessment))
+class ResponseGenerator:
+    """Generates sales-friendly responses from feasibility assessments"""
 
-            # Confidence explanation
-            response_parts.append(self._create_confidence_footer(assessment))
+    # All state is class-level, so instances carry no __dict__
+    __slots__ = ()
+
+    confidence_emojis = {
+        'High': '🟢',
+        'Medium': '🟡',
+        'Low': '🔴'
+    }
+
+    feasibility_emojis = {
+        'Yes': '✅',
+        'No': '❌',
+        'Conditional': '⚠️'
+    }
+
+    # Map capabilities to user-friendly descriptions
+    _CAPABILITY_DESCRIPTIONS = {
+        'contract_creation': 'Create contracts from your templates',
+        'file_management': 'Upload and manage documents/files',
+        'multi_party_contracts': 'Handle contracts with multiple parties and signers',
+        'template_management': 'Create and customize contract templates',
+        'webhook_integration': 'Set up real-time notifications and integrations',
+        'contact_management': 'Manage contact information and party details',
+        'contract_publishing': 'Send contracts for review and signing',
+        'data_extraction': 'Extract and use data from completed contracts'
+    }
+
+    _FEATURE_NAMES = {
+        'contract_creation': 'Contract Creation',
+        'file_management': 'Document Management',
+        'multi_party_contracts': 'Multi-Party Workflows',
+        'template_management': 'Template Customization',
+        'webhook_integration': 'API Integrations',
+        'contact_management': 'Contact Database',
+        'contract_publishing': 'Digital Signing',
+        'data_extraction': 'Data Automation'
+    }
 
-            return '\n\n'.join(response_parts)
+    def generate_response(self, assessment: Dict[str, Any], original_question: str) -> str:
+        """Generate a complete sales response from assessment"""
+        try:
+            return '\n\n'.join(self.iter_response(assessment, original_question))
 
         except Exception as e:
             return self._create_error_response(str(e))
 
+    def iter_response(self, assessment: Dict[str, Any], original_question: str,
+                      partial: bool = False) -> Iterator[str]:
+        """Yield response sections in display order
+
+        With partial=True the assessment is still streaming in, and iteration
+        stops at the first section whose field has not arrived yet.
+        """
+        def pending(field: str) -> bool:
+            return partial and field not in assessment
+
+        # Header with quick answer
+        if pending('quick_answer'):
+            return
+        yield self._create_header(assessment, original_question)
+
+        # Main explanation
+        if pending('capabilities_used'):
+            return
+        yield self._create_explanation(assessment)
+
+        # Important caveats (if any)
+        if pending('important_caveats'):
+            return
+        if assessment.get('important_caveats'):
+            yield self._create_caveats_section(assessment)
+
+        # Business impact
+        if pending('business_impact'):
+            return
+        yield self._create_business_impact(assessment)
+
+        # Related features (if any)
+        if pending('related_features'):
+            return
+        if assessment.get('related_features'):
+            yield self._create_related_features(assessment)
+
+        # Follow-up questions (if any)
+        if pending('follow_up_questions'):
+            return
+        if assessment.get('follow_up_questions'):
+            yield self._create_follow_up_section(assessment)
+
+        # Confidence explanation
+        if pending('confidence_reasoning'):
+            return
+        yield self._create_confidence_footer(assessment)
+
     def _create_header(self, assessment: Dict[str, Any], original_question: str) -> str:
         """Create response header with quick answer"""
         feasibility = assessment.get('feasibility', 'Conditional')
@@ -64,10 +133,7 @@ class ResponseGenerator:
         feasibility_icon = self.feasibility_emojis.get(feasibility, '❓')
         confidence_icon = self.confidence_emojis.get(confidence, '🟡')
 
-        header = f"**{feasibility_icon} Quick Answer: {feasibility}** {confidence_icon}\n\n"
-        header += f"**{quick_answer}**"
-
-        return header
+        return f"**{feasibility_icon} Quick Answer: {feasibility}** {confidence_icon}\n\n**{quick_answer}**"
 
     def _create_explanation(self, assessment: Dict[str, Any]) -> str:
         """Create detailed explanation section"""
@@ -76,25 +142,12 @@ class ResponseGenerator:
         if not capabilities:
             return "This request can be assessed based on OneFlow's general API capabilities."
 
-        explanation = "**How this works with OneFlow:**\n"
-
-        # Map capabilities to user-friendly descriptions
-        capability_descriptions = {
-            'contract_creation': 'Create contracts from your templates',
-            'file_management': 'Upload and manage documents/files',
-            'multi_party_contracts': 'Handle contracts with multiple parties and signers',
-            'template_management': 'Create and customize contract templates',
-            'webhook_integration': 'Set up real-time notifications and integrations',
-            'contact_management': 'Manage contact information and party details',
-            'contract_publishing': 'Send contracts for review and signing',
-            'data_extraction': 'Extract and use data from completed contracts'
-        }
-
+        lines = ["**How this works with OneFlow:**"]
         for capability in capabilities:
-            description = capability_descriptions.get(capability, f"Use {capability.replace('_', ' ')}")
-            explanation += f"• {description}\n"
+            description = self._CAPABILITY_DESCRIPTIONS.get(capability, f"Use {capability.replace('_', ' ')}")
+            lines.append(f"• {description}")
 
-        return explanation
+        return "\n".join(lines) + "\n"
 
     def _create_caveats_section(self, assessment: Dict[str, Any]) -> str:
         """Create important caveats section"""
@@ -103,17 +156,16 @@ class ResponseGenerator:
         if not caveats:
             return ""
 
-        section = "**Important Considerations:**\n"
-        for caveat in caveats:
-            section += f"• {caveat}\n"
+        lines = ["**Important Considerations:**"]
+        lines.extend(f"• {caveat}" for caveat in caveats)
 
-        return section
+        return "\n".join(lines) + "\n"
 
     def _create_business_impact(self, assessment: Dict[str, Any]) -> str:
         """Create business impact section"""
         impact = assessment.get('business_impact', '')
 
-        if not impact or impact == 'Standard implementation considerations apply':
+        if not impact or impact == STANDARD_IMPACT:
             return ""
 
         return f"**Business Impact:** {impact}"
@@ -125,23 +177,12 @@ class ResponseGenerator:
         if not related:
             return ""
 
-        feature_names = {
-            'contract_creation': 'Contract Creation',
-            'file_management': 'Document Management',
-            'multi_party_contracts': 'Multi-Party Workflows',
-            'template_management': 'Template Customization',
-            'webhook_integration': 'API Integrations',
-            'contact_management': 'Contact Database',
-            'contract_publishing': 'Digital Signing',
-            'data_extraction': 'Data Automation'
-        }
-
-        section = "**You might also be interested in:**\n"
+        lines = ["**You might also be interested in:**"]
         for feature in related[:3]:  # Limit to top 3
-            name = feature_names.get(feature, feature.replace('_', ' ').title())
-            section += f"• {name}\n"
+            name = self._FEATURE_NAMES.get(feature, feature.replace('_', ' ').title())
+            lines.append(f"• {name}")
 
-        return section
+        return "\n".join(lines) + "\n"
 
     def _create_follow_up_section(self, assessment: Dict[str, Any]) -> str:
         """Create follow-up questions section"""
@@ -150,11 +191,10 @@ class ResponseGenerator:
         if not questions:
             return ""
 
-        section = "**To better help you, I'd like to know:**\n"
-        for question in questions[:3]:  # Limit to top 3
-            section += f"• {question}\n"
+        lines = ["**To better help you, I'd like to know:**"]
+        lines.extend(f"• {question}" for question in questions[:3])  # Limit to top 3
 
-        return section
+        return "\n".join(lines) + "\n"
 
     def _create_confidence_footer(self, assessment: Dict[str, Any]) -> str:
         """Create confidence explanation footer"""
@@ -206,21 +246,8 @@ Please try rephrasing your question or contact support if the issue persists.
         """Format assessment for email sharing"""
         summary = self.create_summary_export(assessment, original_question)
 
-        email_body = f"""OneFlow API Feasibility Assessment
-
-Question: {original_question}
+        caveats = "\n".join(f"• {caveat}" for caveat in summary['key_caveats'])
 
-Assessment: {summary['feasibility']} (Confidence: {summary['confidence']})
-
-Summary: {summary['quick_answer']}
-
-Key Considerations:
-{chr(10).join([f"• {caveat}" for caveat in summary['key_caveats']])}
-
-Business Impact: {summary['business_impact']}
-
-Generated: {summary['timestamp']}
-Assessment Method: {summary['assessment_method']}
-"""
+        email_body = _EMAIL_TEMPLATE.safe_substitute(summary, key_caveats=caveats)
 
         return email_body
\ No newline at end of file
@@ -8,15 +8,21 @@ from dotenv import load_dotenv
 # Load environment variables
 load_dotenv()
 
+OPENAI_API_KEY = os.getenv('OPENAI_API_KEY')
+
 
 def test_openai_connection():
     """Test OpenAI API connection"""
+    if not OPENAI_API_KEY:
+        print("⚠️ OpenAI Connection: SKIPPED - OPENAI_API_KEY not set")
+        return False
+
     try:
-        from openai import OpenAI
-        client = OpenAI(api_key=os.getenv('OPENAI_API_KEY'))
+        from components.feasibility_analyzer import get_openai_client
+        client = get_openai_client()
 
         response = client.chat.completions.create(
-            model="gpt-4",
+            model=os.getenv('OAI_SMOKE_MODEL', 'gpt-3.5-turbo'),
             messages=[{"role": "user", "content": "Hello, this is a test. Reply with 'OpenAI working!'"}],
             max_tokens=10
         )
@@ -84,11 +90,11 @@ def main():
     print("🔧 OneFlow API Helper - Component Testing\n")
 
     # Test environment setup
-    if not os.getenv('OPENAI_API_KEY'):
+    if not OPENAI_API_KEY:
         print("❌ OPENAI_API_KEY not found in environment")
         return
 
-    print(f"OpenAI API Key: {os.getenv('OPENAI_API_KEY')[:10]}..." + "*" * 20)
+    print(f"OpenAI API Key: {OPENAI_API_KEY[:10]}..." + "*" * 20)
     print()
 
     # Run individual tests
@@ -5,8 +5,14 @@ Integrates EnhancedFeasibilityAnalyzer alongside existing FeasibilityAnalyzer
 
 import streamlit as st
 import asyncio
-from typing import Optional, Dict, Any
+import sys
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from typing import TYPE_CHECKING, Optional, Dict, Any, List, Tuple
+from dataclasses import dataclass, field, replace
 from datetime import datetime
+import numpy as np
 import time
 import os
 from dotenv import load_dotenv
@@ -14,13 +20,104 @@ from dotenv import load_dotenv
 # Load environment variables FIRST
 load_dotenv()
 
-# Import your existing components
-from components.feasibility_analyzer import FeasibilityAnalyzer
-from components.response_generator import ResponseGenerator
-from components.api_docs_processor import APIDocsProcessor
+# Analyzers (and chromadb/langchain behind them) are imported when the manager is
+# first created, so importing this module stays cheap and a missing RAG dependency
+# only disables the enhanced analyzer
+if TYPE_CHECKING:
+    from enhanced_feasibility_analyzer import EnhancedAssessment, EnhancedFeasibilityAnalyzer
+
+# Assessment results kept per session, least recently used evicted first
+RESULT_CACHE_SIZE = 512
+
+# Cosine similarity above which a reworded question reuses a cached result; kept
+# high because every question here is about the same contract domain
+SEMANTIC_MATCH_THRESHOLD = 0.92
+
+# Seconds to wait for the enhanced analyzer before using the original one's answer
+ENHANCED_TIMEOUT = 30
+
+# Seconds the sidebar system status (collection counts) is reused across reruns
+STATUS_TTL = 30
+
+# Conversation entries kept in the session; older ones are dropped
+MAX_HISTORY = 20
+
+# st.fragment arrived in Streamlit 1.37; older versions rerun the whole page
+_fragment = getattr(st, "fragment", None) or (lambda func: func)
+
+# Feasibility value -> full status line; unknown values get "❓ <value>"
+_STATUS_LINES = {
+    "YES": "✅ YES",
+    "NO": "❌ NO",
+    "CONDITIONAL": "⚠️ CONDITIONAL",
+    "NEEDS_ANALYSIS": "🔍 NEEDS_ANALYSIS"
+}
+
+_ORIGINAL_STATUS_LINES = {
+    "Yes": "✅ Yes",
+    "No": "❌ No",
+    "Conditional": "⚠️ Conditional"
+}
+
+# Original analyzer confidence labels mapped to percentages
+_CONFIDENCE_SCORES = {"High": 0.9, "Medium": 0.6, "Low": 0.3}
+
+# Checked in order against the complexity text, e.g. "MEDIUM - needs CRM mapping"
+_COMPLEXITY_COLORS = (("LOW", "🟢"), ("MEDIUM", "🟡"), ("HIGH", "🔴"))
+
+
+def _complexity_line(complexity: str) -> str:
+    """Complexity text prefixed with the colour of the first level it mentions"""
+    for level, color in _COMPLEXITY_COLORS:
+        if level in complexity:
+            return f"{color} {complexity}"
+    return f"🔵 {complexity}"
+
+
+def _interned(items: List[Any]) -> Tuple[Any, ...]:
+    """Intern string items, so caveats and steps repeated across history share one copy"""
+    return tuple(sys.intern(item) if isinstance(item, str) else item for item in items)
+
+
+@dataclass(slots=True)
+class AssessmentResult:
+    """Assessment from either analyzer, in the shape the UI renders"""
+    type: str
+    status: str
+    confidence: str
+    explanation: str
+    api_requirements: Tuple[str, ...]
+    integration_complexity: str
+    business_context: str
+    caveats: Tuple[str, ...]
+    related_endpoints: Tuple[str, ...]
+    integration_patterns: Tuple[str, ...]
+    implementation_steps: Tuple[str, ...]
+    sources: Tuple[Any, ...]
+    processing_time: float
+    raw_assessment: Any
+    cached: bool = False
+    
+    # Pre-rendered once, so each rerun emits one element per section
+    time_caption: str = field(init=False)
+    api_md: str = field(init=False)
+    endpoints_code: str = field(init=False)
+    complexity_md: str = field(init=False)
+    patterns_md: str = field(init=False)
+    caveats_md: str = field(init=False)
+    steps_md: str = field(init=False)
+    
+    def __post_init__(self):
+        self.time_caption = f"⚡ {self.processing_time:.2f}s"
+        self.api_md = "  \n".join(f"• {req}" for req in self.api_requirements)
+        self.endpoints_code = "\n".join(self.related_endpoints)
+        self.complexity_md = _complexity_line(self.integration_complexity)
+        self.patterns_md = "  \n".join(f"🔗 {pattern}" for pattern in self.integration_patterns)
+        self.caveats_md = "  \n".join(f"⚠️ {caveat}" for caveat in self.caveats)
+        self.steps_md = "\n".join(
+            f"{i}. {step}" for i, step in enumerate(self.implementation_steps, 1)
+        )
 
-# Import the new enhanced system
-from enhanced_feasibility_analyzer import EnhancedFeasibilityAnalyzer, EnhancedAssessment
 
 class DualAnalyzerManager:
     """Manages both original and enhanced analyzers"""
@@ -28,6 +125,9 @@ class DualAnalyzerManager:
     def __init__(self):
         """Initialize both analyzer systems"""
         
+        from components.feasibility_analyzer import FeasibilityAnalyzer
+        from components.response_generator import ResponseGenerator
+        
         # Original system (fallback)
         self.original_analyzer = FeasibilityAnalyzer()
         self.response_generator = ResponseGenerator()
@@ -36,25 +136,53 @@ class DualAnalyzerManager:
         self.enhanced_analyzer = None
         self.enhanced_available = False
         
-        # Initialize enhanced system
+        # (mode, normalized question) -> (result, unit question embedding or None)
+        self._result_cache: "OrderedDict[Tuple[str, str], Tuple[AssessmentResult, Optional[np.ndarray]]]" = OrderedDict()
+        self._status_cache: Optional[Tuple[float, Dict[str, Any]]] = None
+        
+        # Enhanced system initialization
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="analyzer")
+        
+        # Initialize enhanced system without holding up the first page render
+        self._enhanced_future = None
         self._initialize_enhanced_system()
     
     def _initialize_enhanced_system(self):
-        """Initialize enhanced RAG system with error handling"""
+        """Start loading the enhanced RAG system in the background"""
+        self._enhanced_future = self._executor.submit(self._load_enhanced_analyzer)
+    
+    @staticmethod
+    @st.cache_resource(show_spinner=False)
+    def _load_enhanced_analyzer() -> "EnhancedFeasibilityAnalyzer":
+        """Build the enhanced analyzer (embeddings, vector store, collections), shared by all sessions"""
+        from enhanced_feasibility_analyzer import EnhancedFeasibilityAnalyzer
+        
+        return EnhancedFeasibilityAnalyzer(use_existing_api_processor=True)
+    
+    @property
+    def enhanced_loading(self) -> bool:
+        """Whether the enhanced system is still initializing"""
+        return self._enhanced_future is not None and not self._enhanced_future.done()
+    
+    def _collect_enhanced_system(self):
+        """Adopt the enhanced analyzer once its background initialization has finished"""
+        future = self._enhanced_future
+        if future is None or not future.done():
+            return
+        
+        self._enhanced_future = None
+        self._status_cache = None
         try:
-            with st.spinner("🚀 Initializing Enhanced RAG System..."):
-                self.enhanced_analyzer = EnhancedFeasibilityAnalyzer(
-                    use_existing_api_processor=True
-                )
-                self.enhanced_available = True
-                st.success("✅ Enhanced RAG System Ready!")
-                
+            self.enhanced_analyzer = future.result()
+            self.enhanced_available = True
+            st.success("✅ Enhanced RAG System Ready!")
+            
         except Exception as e:
             st.warning(f"⚠️ Enhanced system unavailable: {e}")
             st.info("💡 Falling back to original analyzer")
             self.enhanced_available = False
     
-    async def assess_feasibility(self, question: str, use_enhanced: bool = True) -> Dict[str, Any]:
+    def assess_feasibility(self, question: str, use_enhanced: bool = True) -> AssessmentResult:
         """
         Assess feasibility using either enhanced or original analyzer
         
@@ -66,61 +194,144 @@ class DualAnalyzerManager:
             Standardized assessment result
         """
         
-        start_time = time.time()
+        start_time = time.perf_counter()
+        
+        # Still initializing: answer with the original analyzer rather than wait
+        self._collect_enhanced_system()
+        mode = "enhanced" if use_enhanced and self.enhanced_available else "original"
+        key = (mode, " ".join(question.lower().split()))
+        
+        # Exact repeats first, then (enhanced only) reworded near-duplicates
+        embedding = None
+        cached = self._result_cache.get(key)
+        if cached is not None:
+            self._result_cache.move_to_end(key)
+            cached_result = cached[0]
+        else:
+            if mode == "enhanced":
+                embedding = self._embed_question(question)
+            cached_result = self._find_similar_result(mode, embedding)
+        
+        if cached_result is not None:
+            processing_time = time.perf_counter() - start_time
+            return replace(cached_result, processing_time=processing_time, cached=True)
+        
+        result = self._run_assessment(question, mode, start_time)
+        
+        # Only cache answers from the requested analyzer that did not fall back
+        if result.type == mode and not self._is_fallback(result):
+            self._result_cache[key] = (result, embedding)
+            if len(self._result_cache) > RESULT_CACHE_SIZE:
+                self._result_cache.popitem(last=False)
+        
+        return result
+    
+    def _run_assessment(self, question: str, mode: str, start_time: float) -> AssessmentResult:
+        """Run the requested analyzer, falling back to the original one"""
         
         # Try enhanced analyzer first if available and requested
-        if use_enhanced and self.enhanced_available:
+        if mode == "enhanced":
+            # The coroutine runs on the shared loop thread; this script thread only
+            # waits, so the st calls below still reach the page
+            enhanced_future = asyncio.run_coroutine_threadsafe(
+                self.enhanced_analyzer.assess_feasibility_enhanced(question), get_event_loop()
+            )
             try:
-                enhanced_result = await self.enhanced_analyzer.assess_feasibility_enhanced(question)
-                processing_time = time.time() - start_time
+                enhanced_result = enhanced_future.result(timeout=ENHANCED_TIMEOUT)
                 
-                return self._format_enhanced_result(enhanced_result, processing_time)
+                if enhanced_result.feasibility != "NEEDS_ANALYSIS":
+                    processing_time = time.perf_counter() - start_time
+                    
+                    return self._format_enhanced_result(enhanced_result, processing_time)
+                
+                st.warning(enhanced_result.explanation)
+                st.info("🔄 Falling back to original analyzer...")
+                
+            except FutureTimeoutError:
+                enhanced_future.cancel()
+                st.warning(f"Enhanced analysis took longer than {ENHANCED_TIMEOUT}s")
+                st.info("🔄 Falling back to original analyzer...")
                 
             except Exception as e:
                 st.warning(f"Enhanced analysis failed: {e}")
                 st.info("🔄 Falling back to original analyzer...")
         
-        # Fallback to original analyzer
+        # Fallback to original analyzer, only started once it is needed; staying on
+        # the script thread keeps the analyzer's warnings visible
         try:
             original_result = self.original_analyzer.assess_feasibility(question)
-            processing_time = time.time() - start_time
+            processing_time = time.perf_counter() - start_time
             
             return self._format_original_result(original_result, processing_time)
             
         except Exception as e:
-            return self._create_error_result(str(e), time.time() - start_time)
+            return self._create_error_result(str(e), time.perf_counter() - start_time)
+    
+    def _embed_question(self, question: str) -> Optional[np.ndarray]:
+        """Unit-length embedding of a question, or None if embedding fails"""
+        try:
+            # Goes through the analyzer's embedding caches, so the hybrid search that
+            # follows a cache miss reuses this vector instead of embedding again
+            vector = np.asarray(self.enhanced_analyzer.embed_query(question))
+            return vector / np.linalg.norm(vector)
+        except Exception:
+            return None
     
-    def _format_enhanced_result(self, assessment: EnhancedAssessment, processing_time: float) -> Dict[str, Any]:
+    def _find_similar_result(self, mode: str, embedding: Optional[np.ndarray]) -> Optional[AssessmentResult]:
+        """Cached result whose question is semantically closest, if close enough"""
+        if embedding is None:
+            return None
+        
+        keys = [key for key, (_, vector) in self._result_cache.items()
+                if key[0] == mode and vector is not None]
+        if not keys:
+            return None
+        
+        similarities = np.stack([self._result_cache[key][1] for key in keys]) @ embedding
+        best = int(np.argmax(similarities))
+        if similarities[best] < SEMANTIC_MATCH_THRESHOLD:
+            return None
+        
+        self._result_cache.move_to_end(keys[best])
+        return self._result_cache[keys[best]][0]
+    
+    @staticmethod
+    def _is_fallback(result: AssessmentResult) -> bool:
+        """Whether a result came from a fallback path that should be retried next time"""
+        raw = result.raw_assessment
+        if result.type == "enhanced":
+            return raw.feasibility == "NEEDS_ANALYSIS"
+        return bool(raw.get('fallback_used'))
+    
+    def clear_result_cache(self):
+        """Forget cached assessments and status, e.g. after the knowledge base changes"""
+        self._result_cache.clear()
+        self._status_cache = None
+    
+    def _format_enhanced_result(self, assessment: "EnhancedAssessment", processing_time: float) -> AssessmentResult:
         """Format enhanced assessment result for UI"""
         
-        # Determine status icon
-        status_icons = {
-            "YES": "✅",
-            "NO": "❌", 
-            "CONDITIONAL": "⚠️",
-            "NEEDS_ANALYSIS": "🔍"
-        }
-        
-        status_icon = status_icons.get(assessment.feasibility, "❓")
-        
-        return {
-            "type": "enhanced",
-            "status": f"{status_icon} {assessment.feasibility}",
-            "confidence": f"🎯 {assessment.confidence:.0%}",
-            "explanation": assessment.explanation,
-            "api_requirements": assessment.api_requirements,
-            "integration_complexity": assessment.integration_complexity,
-            "business_context": assessment.business_context,
-            "caveats": assessment.caveats,
-            "related_endpoints": assessment.related_endpoints,
-            "integration_patterns": assessment.integration_patterns,
-            "implementation_steps": assessment.implementation_steps,
-            "sources": assessment.sources,
-            "processing_time": processing_time,
-            "raw_assessment": assessment
-        }
+        # Determine status line
+        status = _STATUS_LINES.get(assessment.feasibility) or f"❓ {assessment.feasibility}"
+        
+        return AssessmentResult(
+            type="enhanced",
+            status=status,
+            confidence=f"🎯 {assessment.confidence:.0%}",
+            explanation=assessment.explanation,
+            api_requirements=_interned(assessment.api_requirements),
+            integration_complexity=assessment.integration_complexity,
+            business_context=assessment.business_context,
+            caveats=_interned(assessment.caveats),
+            related_endpoints=_interned(assessment.related_endpoints),
+            integration_patterns=_interned(assessment.integration_patterns),
+            implementation_steps=_interned(assessment.implementation_steps),
+            sources=tuple(assessment.sources),
+            processing_time=processing_time,
+            raw_assessment=assessment
+        )
     
-    def _format_original_result(self, assessment: Dict[str, Any], processing_time: float) -> Dict[str, Any]:
+    def _format_original_result(self, assessment: Dict[str, Any], processing_time: float) -> AssessmentResult:
         """Format original assessment result for UI"""
         
         # Convert original format to enhanced format for consistent UI
@@ -128,61 +339,60 @@ class DualAnalyzerManager:
         confidence = assessment.get('confidence', 'Medium')
         
         # Map confidence to percentage
-        confidence_map = {"High": 0.9, "Medium": 0.6, "Low": 0.3}
-        confidence_score = confidence_map.get(confidence, 0.5)
-        
-        status_icons = {
-            "Yes": "✅",
-            "No": "❌",
-            "Conditional": "⚠️"
-        }
-        
-        status_icon = status_icons.get(feasibility, "❓")
-        
-        return {
-            "type": "original",
-            "status": f"{status_icon} {feasibility}",
-            "confidence": f"🎯 {confidence_score:.0%}",
-            "explanation": assessment.get('quick_answer', 'Assessment completed'),
-            "api_requirements": ["Original analyzer - API requirements not detailed"],
-            "integration_complexity": confidence,  # Use confidence as complexity proxy
-            "business_context": assessment.get('business_impact', 'Standard implementation'),
-            "caveats": assessment.get('important_caveats', []),
-            "related_endpoints": [],
-            "integration_patterns": assessment.get('related_features', []),
-            "implementation_steps": ["Contact technical team for detailed implementation"],
-            "sources": [],
-            "processing_time": processing_time,
-            "raw_assessment": assessment
-        }
+        confidence_score = _CONFIDENCE_SCORES.get(confidence, 0.5)
+        
+        status = _ORIGINAL_STATUS_LINES.get(feasibility) or f"❓ {feasibility}"
+        
+        return AssessmentResult(
+            type="original",
+            status=status,
+            confidence=f"🎯 {confidence_score:.0%}",
+            explanation=assessment.get('quick_answer', 'Assessment completed'),
+            api_requirements=("Original analyzer - API requirements not detailed",),
+            integration_complexity=confidence,  # Use confidence as complexity proxy
+            business_context=assessment.get('business_impact', 'Standard implementation'),
+            caveats=_interned(assessment.get('important_caveats', [])),
+            related_endpoints=(),
+            integration_patterns=_interned(assessment.get('related_features', [])),
+            implementation_steps=("Contact technical team for detailed implementation",),
+            sources=(),
+            processing_time=processing_time,
+            raw_assessment=assessment
+        )
     
-    def _create_error_result(self, error: str, processing_time: float) -> Dict[str, Any]:
+    def _create_error_result(self, error: str, processing_time: float) -> AssessmentResult:
         """Create error result when both analyzers fail"""
         
-        return {
-            "type": "error",
-            "status": "❌ ERROR",
-            "confidence": "❓ Unknown",
-            "explanation": f"Assessment failed: {error}",
-            "api_requirements": ["Manual review required"],
-            "integration_complexity": "UNKNOWN",
-            "business_context": "Unable to analyze due to system error",
-            "caveats": ["System error occurred", "Manual technical review needed"],
-            "related_endpoints": [],
-            "integration_patterns": [],
-            "implementation_steps": ["Contact technical support"],
-            "sources": [],
-            "processing_time": processing_time,
-            "raw_assessment": {}
-        }
+        return AssessmentResult(
+            type="error",
+            status="❌ ERROR",
+            confidence="❓ Unknown",
+            explanation=f"Assessment failed: {error}",
+            api_requirements=("Manual review required",),
+            integration_complexity="UNKNOWN",
+            business_context="Unable to analyze due to system error",
+            caveats=("System error occurred", "Manual technical review needed"),
+            related_endpoints=(),
+            integration_patterns=(),
+            implementation_steps=("Contact technical support",),
+            sources=(),
+            processing_time=processing_time,
+            raw_assessment={}
+        )
     
     def get_system_status(self) -> Dict[str, Any]:
-        """Get status of both analyzer systems"""
+        """Get status of both analyzer systems, reusing it for STATUS_TTL seconds"""
+        
+        self._collect_enhanced_system()
+        now = time.monotonic()
+        if self._status_cache is not None and now - self._status_cache[0] < STATUS_TTL:
+            return self._status_cache[1]
         
         status = {
             "original_available": True,  # Always available
             "enhanced_available": self.enhanced_available,
-            "recommended_mode": "enhanced" if self.enhanced_available else "original"
+            "enhanced_loading": self.enhanced_loading,
+            "recommended_mode": "enhanced" if self.enhanced_available or self.enhanced_loading else "original"
         }
         
         if self.enhanced_available:
@@ -195,6 +405,7 @@ class DualAnalyzerManager:
                 status["collection_stats"] = {}
                 status["error"] = str(e)
         
+        self._status_cache = (now, status)
         return status
 
 # Enhanced UI Components for the new system
@@ -224,6 +435,9 @@ class EnhancedUI:
                 for collection, count in status["collection_stats"].items():
                     collection_name = collection.replace("_", " ").title()
                     st.sidebar.metric(collection_name, count)
+        elif status.get("enhanced_loading"):
+            st.sidebar.info("⏳ Enhanced RAG: Initializing...")
+            st.sidebar.caption("Questions use the original analyzer until it is ready")
         else:
             st.sidebar.warning("⚠️ Enhanced RAG: Unavailable")
             st.sidebar.info("Using original analyzer")
@@ -239,23 +453,23 @@ class EnhancedUI:
         )
     
     @staticmethod
-    def render_enhanced_assessment(result: Dict[str, Any]):
+    def render_enhanced_assessment(result: AssessmentResult):
         """Render enhanced assessment result"""
         
         # Header with status and confidence
         col1, col2 = st.columns([3, 1])
         with col1:
-            st.subheader(result["status"])
+            st.subheader(result.status)
         with col2:
-            st.metric("Confidence", result["confidence"])
-            st.caption(f"⚡ {result['processing_time']:.2f}s")
+            st.metric("Confidence", result.confidence)
+            st.caption(result.time_caption)
         
         # Main explanation
         st.markdown("### 💡 Assessment Summary")
-        st.info(result["explanation"])
+        st.info(result.explanation)
         
         # Enhanced content in tabs (only for enhanced results)
-        if result["type"] == "enhanced":
+        if result.type == "enhanced":
             tab1, tab2, tab3, tab4 = st.tabs([
                 "🔧 Technical Requirements",
                 "💼 Business Context", 
@@ -267,53 +481,36 @@ class EnhancedUI:
                 col1, col2 = st.columns(2)
                 
                 with col1:
-                    if result["api_requirements"]:
+                    if result.api_requirements:
                         st.markdown("**API Requirements**")
-                        for req in result["api_requirements"]:
-                            st.write(f"• {req}")
+                        st.markdown(result.api_md)
                     
-                    if result["related_endpoints"]:
+                    if result.related_endpoints:
                         st.markdown("**Related Endpoints**")
-                        for endpoint in result["related_endpoints"]:
-                            st.code(endpoint, language="http")
+                        st.code(result.endpoints_code, language="http")
                 
                 with col2:
                     st.markdown("**Integration Complexity**")
-                    complexity = result["integration_complexity"]
-                    complexity_colors = {
-                        "LOW": "🟢",
-                        "MEDIUM": "🟡", 
-                        "HIGH": "🔴"
-                    }
-                    
-                    for level in ["LOW", "MEDIUM", "HIGH"]:
-                        if level in complexity:
-                            st.write(f"{complexity_colors[level]} {complexity}")
-                            break
-                    else:
-                        st.write(f"🔵 {complexity}")
+                    st.write(result.complexity_md)
             
             with tab2:
                 st.markdown("**Business Context**")
-                st.write(result["business_context"])
+                st.write(result.business_context)
                 
-                if result["integration_patterns"]:
+                if result.integration_patterns:
                     st.markdown("**Applicable Integration Patterns**")
-                    for pattern in result["integration_patterns"]:
-                        st.write(f"🔗 {pattern}")
+                    st.markdown(result.patterns_md)
             
             with tab3:
-                if result["caveats"]:
-                    for caveat in result["caveats"]:
-                        st.warning(f"⚠️ {caveat}")
+                if result.caveats:
+                    st.warning(result.caveats_md)
                 else:
                     st.success("✅ No significant limitations identified")
             
             with tab4:
-                if result["implementation_steps"]:
+                if result.implementation_steps:
                     st.markdown("**Implementation Steps**")
-                    for i, step in enumerate(result["implementation_steps"], 1):
-                        st.write(f"{i}. {step}")
+                    st.markdown(result.steps_md)
                 else:
                     st.info("Implementation steps not available")
         
@@ -322,24 +519,26 @@ class EnhancedUI:
             col1, col2 = st.columns(2)
             
             with col1:
-                if result["caveats"]:
+                if result.caveats:
                     st.markdown("**Important Considerations**")
-                    for caveat in result["caveats"]:
-                        st.warning(f"⚠️ {caveat}")
+                    st.warning(result.caveats_md)
             
             with col2:
                 st.markdown("**Business Impact**") 
-                st.write(result["business_context"])
+                st.write(result.business_context)
     
     @staticmethod
+    @_fragment
     def render_knowledge_management():
-        """Render knowledge base management interface"""
+        """Render knowledge base management interface; call it inside the sidebar"""
         
-        st.sidebar.markdown("---")
-        st.sidebar.markdown("## 📚 Knowledge Base")
+        # Uploads and clicks in here rerun only this section, not the whole page;
+        # a fragment may only write to its own container, hence st. over st.sidebar.
+        st.markdown("---")
+        st.markdown("## 📚 Knowledge Base")
         
         # Add documents section
-        with st.sidebar.expander("➕ Add Documents"):
+        with st.expander("➕ Add Documents"):
             st.write("Upload integration documents to enhance the knowledge base")
             
             uploaded_files = st.file_uploader(
@@ -354,9 +553,18 @@ class EnhancedUI:
                 # TODO: Implement document processing
         
         # Refresh knowledge base
-        if st.sidebar.button("🔄 Refresh Knowledge Base"):
+        if st.button("🔄 Refresh Knowledge Base"):
             st.rerun()
 
+@st.cache_resource(show_spinner=False)
+def get_event_loop() -> asyncio.AbstractEventLoop:
+    """Process-wide event loop on its own thread for the shared analyzer's async clients"""
+    # The enhanced analyzer is shared by every session, and its async connection
+    # pools are bound to the loop that opened them, so all sessions use this one
+    loop = asyncio.new_event_loop()
+    threading.Thread(target=loop.run_forever, name="analyzer-event-loop", daemon=True).start()
+    return loop
+
 # Main enhanced application
 def main_enhanced():
     """Enhanced main application with dual analyzer system"""
@@ -445,28 +653,24 @@ def main_enhanced():
     if assess_button and user_input:
         st.session_state.assessment_count += 1
         
-        # Add to conversation history
+        # Add to conversation history; the expander label is built once here
+        question_label = user_input if len(user_input) <= 100 else f"{user_input[:100]}..."
         conversation_entry = {
             'question': user_input,
+            'label': f"🔍 {question_label}",
             'timestamp': datetime.now(),
             'status': 'processing'
         }
         st.session_state.conversation_history.append(conversation_entry)
+        del st.session_state.conversation_history[:-MAX_HISTORY]
         
         # Show processing
         with st.spinner("🤖 Analyzing with advanced system..."):
-            # Use async assessment
-            loop = asyncio.new_event_loop()
-            asyncio.set_event_loop(loop)
-            try:
-                result = loop.run_until_complete(
-                    analyzer_manager.assess_feasibility(
-                        user_input, 
-                        use_enhanced=(analysis_mode == "enhanced")
-                    )
-                )
-            finally:
-                loop.close()
+            # Async analyzer calls are dispatched to the shared event loop
+            result = analyzer_manager.assess_feasibility(
+                user_input, 
+                use_enhanced=(analysis_mode == "enhanced")
+            )
         
         # Update conversation history
         st.session_state.conversation_history[-1].update({
@@ -486,10 +690,7 @@ def main_enhanced():
     st.markdown("## 💬 Assessment History")
     
     for i, convo in enumerate(reversed(st.session_state.conversation_history)):
-        with st.expander(
-            f"🔍 {convo['question'][:100]}..." if len(convo['question']) > 100 else f"🔍 {convo['question']}", 
-            expanded=(i == 0)
-        ):
+        with st.expander(convo['label'], expanded=(i == 0)):
             col1, col2 = st.columns([3, 1])
             with col1:
                 st.caption(f"📅 {convo['timestamp'].strftime('%Y-%m-%d %H:%M:%S')}")
@@ -497,10 +698,19 @@ def main_enhanced():
                 mode_badge = "🚀 Enhanced" if convo.get('analysis_mode') == 'enhanced' else "⚡ Original"
                 st.caption(mode_badge)
             
-            if convo['status'] == 'complete':
-                EnhancedUI.render_enhanced_assessment(convo['result'])
-            else:
+            if convo['status'] != 'complete':
                 st.info("⏳ Processing...")
+            elif i == 0 or convo.get('show_details'):
+                EnhancedUI.render_enhanced_assessment(convo['result'])
+            elif st.button("Show details", key=f"details_{convo['timestamp'].timestamp()}"):
+                # Collapsed entries only build their widgets once asked for
+                convo['show_details'] = True
+                EnhancedUI.render_enhanced_assessment(convo['result'])
+    
+    # Poll the enhanced system until it finishes initializing
+    if system_status.get("enhanced_loading"):
+        time.sleep(1)
+        st.rerun()
 
 if __name__ == "__main__":
     main_enhanced()
\ No newline at end of file
@@ -4,25 +4,99 @@ Architecture: Multiple Collections + Cross-Reference + GPT-4o-mini
 """
 
 import os
-import json
-import yaml
+import re
+import asyncio
+import heapq
+import threading
+from array import array
 from typing import Dict, List, Optional, Any, Tuple
-from dataclasses import dataclass
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, replace
 from enum import Enum
 import chromadb
+import tiktoken
 from langchain_openai import ChatOpenAI, OpenAIEmbeddings
-from langchain_community.vectorstores import Chroma
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain_core.documents import Document
+from langchain_core.messages import BaseMessage
 from langchain_core.prompts import ChatPromptTemplate
+from langchain_core.rate_limiters import InMemoryRateLimiter
 import streamlit as st
 from datetime import datetime
 import hashlib
+from collections import OrderedDict
+from functools import cached_property, lru_cache
 from dotenv import load_dotenv
 
+try:
+    import diskcache
+except ImportError:
+    diskcache = None
+
+try:
+    from orjson import loads as _json_loads
+except ImportError:
+    from json import loads as _json_loads
+
 # Load environment variables FIRST
 load_dotenv()
 
+# Retries on 429s, timeouts and 5xx; the OpenAI client backs off exponentially with
+# jitter and honours Retry-After. Higher than the original analyzer's setting, since
+# bulk embedding runs are not interactive
+OPENAI_MAX_RETRIES = 5
+
+# Token bucket for LLM calls, shared by every session using the analyzer; size it
+# to the account's requests-per-minute limit
+LLM_REQUESTS_PER_MINUTE = 3500
+LLM_BURST_SIZE = 10
+
+# Separate token bucket for embedding requests, which have their own limit
+EMBEDDING_REQUESTS_PER_MINUTE = 3000
+EMBEDDING_BURST_SIZE = 10
+
+# Embedding model and the reduced vector size requested from it; collections built
+# with a different size are rebuilt on startup
+EMBEDDING_MODEL = "text-embedding-3-small"
+EMBEDDING_DIMENSIONS = 512
+
+# Question embeddings kept per analyzer, least recently used evicted first
+EMBEDDING_CACHE_SIZE = 1024
+
+# On-disk embedding store shared across restarts (requires diskcache)
+EMBEDDING_STORE_PATH = "./enhanced_oneflow_db/emb_cache"
+EMBEDDING_STORE_SIZE_LIMIT = 2**30
+
+# On-disk cache of finished assessments by normalized question (requires diskcache)
+ASSESSMENT_STORE_PATH = "./enhanced_oneflow_db/assessment_cache"
+ASSESSMENT_TTL = 24 * 60 * 60
+
+# Documents embedded per OpenAI request when adding to collections; 500 chunks of at
+# most MAX_CHUNK_TOKENS stay within the API's 2048-input and 300k-token request limits
+EMBEDDING_BATCH_SIZE = 500
+
+# Token-aware chunking of added documents: split at CHUNK_SIZE tokens, then merge
+# chunks under MIN_CHUNK_TOKENS into a neighbour while the pair stays within MAX_CHUNK_TOKENS
+CHUNK_ENCODING = "cl100k_base"
+CHUNK_SIZE = 400
+CHUNK_OVERLAP = 40
+MIN_CHUNK_TOKENS = 100
+MAX_CHUNK_TOKENS = 450
+
+# HNSW index settings for new collections. Tuned for the current corpora (a handful
+# to a few thousand chunks per collection); revisit M and search_ef if they grow
+# past ~50k. OpenAI embeddings are unit length, so cosine ranks like the default l2
+HNSW_SETTINGS = {
+    "hnsw:space": "cosine",
+    "hnsw:M": 8,
+    "hnsw:construction_ef": 100,
+    "hnsw:search_ef": 32,
+    "hnsw:batch_size": EMBEDDING_BATCH_SIZE
+}
+
+# Search results kept per source type so the context stays diverse
+MAX_RESULTS_PER_SOURCE_TYPE = 3
+
 class ContentType(Enum):
     API_SPEC = "api_spec"
     INTEGRATION_GUIDE = "integration_guide"
@@ -56,6 +130,119 @@ class EnhancedAssessment:
     implementation_steps: List[str]
     sources: List[SearchResult]
 
+# Shared by every fallback assessment; only the explanation varies, and the
+# sequences are tuples so no caller can mutate the shared instance
+_FALLBACK_ASSESSMENT = EnhancedAssessment(
+    feasibility="NEEDS_ANALYSIS",
+    confidence=0.3,
+    explanation="",
+    api_requirements=("Manual review required",),
+    integration_complexity="UNKNOWN - requires detailed analysis",
+    business_context="Unable to determine without proper analysis",
+    caveats=("Enhanced analysis system unavailable", "Fallback assessment provided"),
+    related_endpoints=(),
+    integration_patterns=(),
+    implementation_steps=("Contact technical team for detailed assessment",),
+    sources=()
+)
+
+# Intent keywords per collection, matched as substrings of the lowercased question so
+# plurals and inflections ("endpoints", "integrating") still count. No keyword is a
+# prefix of another, so a single lookahead scan reports every keyword occurring
+# anywhere in the question
+_INTENT_KEYWORDS = {
+    "api_specifications": ("endpoint", "api", "parameter", "response", "request", "method", "post", "get"),
+    "integration_guides": ("integrate", "integration", "connect", "sync", "crm", "system", "workflow"),
+    "tutorials_examples": ("how to", "tutorial", "example", "step", "guide", "implement"),
+    "use_cases_patterns": ("business", "scenario", "pattern", "value", "benefit", "process"),
+    "glossary_concepts": ("what is", "define", "meaning", "term", "concept"),
+}
+_KEYWORD_COLLECTIONS = {
+    keyword: collection_name
+    for collection_name, keywords in _INTENT_KEYWORDS.items()
+    for keyword in keywords
+}
+_INTENT_PATTERN = re.compile("(?=(" + "|".join(map(re.escape, _KEYWORD_COLLECTIONS)) + "))")
+
+# Module level so the memo is shared by every analyzer instance
+@lru_cache(maxsize=1024)
+def _intent_scores(question_lower: str) -> Tuple[Tuple[str, int], ...]:
+    """Keyword hits per collection for a lowercased question, memoized for repeat questions"""
+    
+    intent_scores = dict.fromkeys(_INTENT_KEYWORDS, 0)
+    for keyword in set(_INTENT_PATTERN.findall(question_lower)):
+        intent_scores[_KEYWORD_COLLECTIONS[keyword]] += 1
+    
+    return tuple(intent_scores.items())
+
+@lru_cache(maxsize=None)
+def _chunk_encoding() -> "tiktoken.Encoding":
+    """Tokenizer used to size chunks, loaded on first use"""
+    return tiktoken.get_encoding(CHUNK_ENCODING)
+
+@lru_cache(maxsize=None)
+def _chunk_splitter() -> RecursiveCharacterTextSplitter:
+    """Token-aware recursive splitter, built on first use"""
+    return RecursiveCharacterTextSplitter.from_tiktoken_encoder(
+        encoding_name=CHUNK_ENCODING, chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP
+    )
+
+def _split_into_chunks(text: str) -> List[str]:
+    """Split text into token-bounded chunks, merging undersized chunks into the previous one"""
+    
+    encoding = _chunk_encoding()
+    chunks: List[str] = []
+    chunk_tokens: List[int] = []
+    
+    for chunk in _chunk_splitter().split_text(text):
+        tokens = len(encoding.encode(chunk))
+        if chunks and min(tokens, chunk_tokens[-1]) < MIN_CHUNK_TOKENS \
+                and chunk_tokens[-1] + tokens <= MAX_CHUNK_TOKENS:
+            chunks[-1] = f"{chunks[-1]}\n{chunk}"
+            chunk_tokens[-1] += tokens
+        else:
+            chunks.append(chunk)
+            chunk_tokens.append(tokens)
+    
+    return chunks
+
+# System prompt for enhanced assessments; {context} and {question} are filled per query
+ENHANCED_SYSTEM_PROMPT = """You are an expert OneFlow integration consultant helping sales teams assess technical feasibility.
+
+CONTEXT FROM ONEFLOW DOCUMENTATION:
+{context}
+
+SALES QUESTION: {question}
+
+Provide a comprehensive assessment in JSON format:
+{{
+    "feasibility": "YES|NO|CONDITIONAL|NEEDS_ANALYSIS",
+    "confidence": 0.0-1.0,
+    "explanation": "Clear, business-focused explanation",
+    "api_requirements": ["Required API endpoints and methods"],
+    "integration_complexity": "LOW|MEDIUM|HIGH with detailed reasoning",
+    "business_context": "How this fits into business workflows", 
+    "caveats": ["Important limitations, dependencies, requirements"],
+    "related_endpoints": ["Relevant API endpoints from context"],
+    "integration_patterns": ["Applicable integration patterns"],
+    "implementation_steps": ["High-level implementation steps"],
+    "timeline_estimate": "Realistic development timeline",
+    "cost_implications": "Development cost considerations"
+}}
+
+GUIDELINES:
+- Use business language, avoid technical jargon
+- Be specific about API requirements and endpoints
+- Consider integration complexity realistically
+- Focus on sales impact and business value
+- Highlight any deal-breaking limitations
+- Reference specific OneFlow capabilities from context
+- Provide actionable implementation guidance"""
+
+# Raw search hit as returned by Chroma: (distance, content, metadata). SearchResult
+# objects are only built for the hits that survive ranking
+_Hit = Tuple[float, str, Dict[str, Any]]
+
 class EnhancedFeasibilityAnalyzer:
     """
     Advanced RAG-based feasibility analyzer with hybrid retrieval
@@ -72,26 +259,56 @@ class EnhancedFeasibilityAnalyzer:
         self.llm = ChatOpenAI(
             model="gpt-4o-mini",
             temperature=0.1,
-            max_tokens=2000
+            max_tokens=2000,
+            max_retries=OPENAI_MAX_RETRIES,
+            rate_limiter=InMemoryRateLimiter(
+                requests_per_second=LLM_REQUESTS_PER_MINUTE / 60,
+                max_bucket_size=LLM_BURST_SIZE
+            ),
+            # JSON mode: the reply is always a single valid JSON object
+            model_kwargs={"response_format": {"type": "json_object"}}
         )
         
-        self.embeddings = OpenAIEmbeddings(model="text-embedding-3-small")
+        # Parsed once; each assessment only formats messages
+        self._prompt_template = ChatPromptTemplate.from_messages([
+            ("system", ENHANCED_SYSTEM_PROMPT),
+            ("human", "Context: {context}\n\nQuestion: {question}")
+        ])
+        
+        self.embeddings = OpenAIEmbeddings(
+            model=EMBEDDING_MODEL, dimensions=EMBEDDING_DIMENSIONS, max_retries=OPENAI_MAX_RETRIES
+        )
+        self._embedding_rate_limiter = InMemoryRateLimiter(
+            requests_per_second=EMBEDDING_REQUESTS_PER_MINUTE / 60,
+            max_bucket_size=EMBEDDING_BURST_SIZE
+        )
+        self._embedding_cache: "OrderedDict[str, List[float]]" = OrderedDict()
+        self._embedding_cache_lock = threading.Lock()
+        self._embedding_store = (
+            diskcache.Cache(EMBEDDING_STORE_PATH, size_limit=EMBEDDING_STORE_SIZE_LIMIT)
+            if diskcache is not None else None
+        )
+        self._assessment_store = diskcache.Cache(ASSESSMENT_STORE_PATH) if diskcache is not None else None
         
         # Initialize ChromaDB client  
         self.chroma_client = chromadb.PersistentClient(path="./enhanced_oneflow_db")
         
         # Multiple collections for hybrid approach
         self.collections = {}
-        self.vector_stores = {}
         
-        # Original API processor integration
-        if use_existing_api_processor:
-            from components.api_docs_processor import APIDocsProcessor
-            self.api_processor = APIDocsProcessor()
+        # Original API processor integration, only loaded if API specs need populating
+        self.use_existing_api_processor = use_existing_api_processor
         
         # Initialize knowledge base
         self._initialize_hybrid_knowledge_base()
     
+    @cached_property
+    def api_processor(self):
+        """Existing APIDocsProcessor, created on first use"""
+        from components.api_docs_processor import APIDocsProcessor
+        
+        return APIDocsProcessor()
+    
     def _initialize_hybrid_knowledge_base(self):
         """Initialize multiple ChromaDB collections for hybrid retrieval"""
         
@@ -127,20 +344,28 @@ class EnhancedFeasibilityAnalyzer:
                 collection = self.chroma_client.get_collection(name=collection_name)
                 print(f"✅ Loaded existing collection: {collection_name}")
             except:
-                collection = self.chroma_client.create_collection(
-                    name=collection_name,
-                    metadata={"content_type": config["type"].value}
-                )
+                collection = None
+            
+            metadata = {
+                "content_type": config["type"].value,
+                "embedding_dimensions": EMBEDDING_DIMENSIONS,
+                **HNSW_SETTINGS
+            }
+            
+            # Vectors of another size cannot be queried with ours; re-embed the stored documents
+            if collection is not None and (collection.metadata or {}).get("embedding_dimensions") != EMBEDDING_DIMENSIONS:
+                collection = self._migrate_collection(collection_name, collection, metadata)
+            
+            if collection is None:
+                collection = self.chroma_client.create_collection(name=collection_name, metadata=metadata)
                 print(f"🆕 Created new collection: {collection_name}")
             
             self.collections[collection_name] = collection
-            
-            # Create Langchain vector store wrapper
-            self.vector_stores[collection_name] = Chroma(
-                client=self.chroma_client,
-                collection_name=collection_name,
-                embedding_function=self.embeddings
-            )
+        
+        # Collections are searched concurrently
+        self._search_executor = ThreadPoolExecutor(
+            max_workers=len(self.collections), thread_name_prefix="collection-search"
+        )
         
         # Load documents if collections are empty
         self._populate_collections_if_needed()
@@ -148,39 +373,110 @@ class EnhancedFeasibilityAnalyzer:
     def _populate_collections_if_needed(self):
         """Populate collections with documents if they're empty"""
         
+        populators = {
+            "api_specifications": self._populate_api_specifications,
+            "integration_guides": self._populate_integration_guides,
+            "tutorials_examples": self._populate_tutorials,
+            "glossary_concepts": self._populate_glossary,
+            "use_cases_patterns": self._populate_use_cases
+        }
+        
+        docs_by_collection = {}
         for collection_name, collection in self.collections.items():
             if collection.count() == 0:
                 print(f"📄 Populating {collection_name}...")
-                
-                if collection_name == "api_specifications":
-                    self._populate_api_specifications()
-                elif collection_name == "integration_guides":
-                    self._populate_integration_guides()
-                elif collection_name == "tutorials_examples":
-                    self._populate_tutorials()
-                elif collection_name == "glossary_concepts": 
-                    self._populate_glossary()
-                elif collection_name == "use_cases_patterns":
-                    self._populate_use_cases()
-    
-    def _populate_api_specifications(self):
-        """Populate API specifications from existing processor"""
+                docs_by_collection[collection_name] = populators[collection_name]()
+        
+        # Embed every collection's documents together, then distribute them
+        self._bulk_add(docs_by_collection)
+        for collection_name, docs in docs_by_collection.items():
+            if docs:
+                print(f"✅ Added {len(docs)} documents to {collection_name}")
+    
+    def _migrate_collection(self, collection_name: str, collection: Any, metadata: Dict[str, Any]) -> Any:
+        """Recreate a collection with our embedding size and index settings, keeping its documents"""
+        
+        print(f"♻️ Migrating {collection_name} to {EMBEDDING_DIMENSIONS}-dimension embeddings")
+        stored = collection.get(include=["documents", "metadatas"])
+        docs = [
+            Document(page_content=content, metadata=doc_metadata or {})
+            for content, doc_metadata in zip(stored["documents"], stored["metadatas"])
+            if content
+        ]
+        
+        # Embed before deleting anything, so a failed OpenAI call leaves the old collection intact
+        try:
+            rows = self._embed_rows({collection_name: docs}).get(collection_name, [])
+        except Exception as e:
+            print(f"❌ Could not re-embed {collection_name}; it was left unchanged: {e}")
+            raise
+        
+        self.chroma_client.delete_collection(name=collection_name)
+        collection = self.chroma_client.create_collection(name=collection_name, metadata=metadata)
+        self._upsert_rows(collection, rows)
+        print(f"✅ Migrated {len(rows)} documents in {collection_name}")
+        return collection
+    
+    def _bulk_add(self, docs_by_collection: Dict[str, List[Document]], batch_size: int = EMBEDDING_BATCH_SIZE):
+        """Embed documents for several collections together, one embedding request per batch"""
+        
+        for collection_name, rows in self._embed_rows(docs_by_collection, batch_size).items():
+            self._upsert_rows(self.collections[collection_name], rows, batch_size)
+    
+    def _embed_rows(self, docs_by_collection: Dict[str, List[Document]],
+                    batch_size: int = EMBEDDING_BATCH_SIZE) -> Dict[str, List[Tuple[str, List[float], Document]]]:
+        """(id, embedding, document) rows per collection, embedded together in batches"""
+        
+        # Content-derived ids make re-adding the same document an idempotent upsert
+        entries = []
+        for collection_name, docs in docs_by_collection.items():
+            unique_docs = {
+                hashlib.blake2b(doc.page_content.encode(), digest_size=8).hexdigest(): doc
+                for doc in docs
+            }
+            entries.extend((collection_name, doc_id, doc) for doc_id, doc in unique_docs.items())
+        texts = [doc.page_content for _, _, doc in entries]
+        
+        embeddings = []
+        for start in range(0, len(texts), batch_size):
+            embeddings.extend(self._embed_documents(texts[start:start + batch_size]))
+        
+        # Distribute the vectors back to their collections
+        rows_by_collection = {}
+        for entry, embedding in zip(entries, embeddings):
+            rows_by_collection.setdefault(entry[0], []).append((entry[1], embedding, entry[2]))
+        return rows_by_collection
+    
+    @staticmethod
+    def _upsert_rows(collection: Any, rows: List[Tuple[str, List[float], Document]],
+                     batch_size: int = EMBEDDING_BATCH_SIZE):
+        """Upsert embedded rows into a collection in batches"""
+        for start in range(0, len(rows), batch_size):
+            batch = rows[start:start + batch_size]
+            collection.upsert(
+                ids=[doc_id for doc_id, _, _ in batch],
+                embeddings=[embedding for _, embedding, _ in batch],
+                documents=[doc.page_content for _, _, doc in batch],
+                metadatas=[doc.metadata for _, _, doc in batch]
+            )
+    
+    def _populate_api_specifications(self) -> List[Document]:
+        """Build API specification documents from existing processor"""
         print("📡 Processing API specifications...")
         
         try:
             # Use existing API processor if available
-            if hasattr(self, 'api_processor'):
+            if self.use_existing_api_processor:
                 api_docs = self._process_existing_api_docs()
             else:
                 api_docs = self._create_fallback_api_docs()
             
-            if api_docs:
-                self.vector_stores["api_specifications"].add_documents(api_docs)
-                print(f"✅ Added {len(api_docs)} API specification documents")
+            return api_docs
             
         except Exception as e:
             print(f"⚠️ Error populating API specs: {e}")
             st.warning(f"Could not load API specifications: {e}")
+            return []
     
     def _process_existing_api_docs(self) -> List[Document]:
         """Process documents from existing API processor"""
@@ -220,26 +516,29 @@ class EnhancedFeasibilityAnalyzer:
     def _format_api_endpoint_content(self, path: str, method: str, data: Dict) -> str:
         """Format API endpoint data into searchable content"""
         
+        get = data.get
         content_parts = [
             f"API Endpoint: {method.upper()} {path}",
-            f"Summary: {data.get('summary', 'No summary available')}",
-            f"Description: {data.get('description', 'No description available')}"
+            f"Summary: {get('summary', 'No summary available')}",
+            f"Description: {get('description', 'No description available')}"
         ]
         
         # Add parameters information
         if 'parameters' in data:
             content_parts.append("Parameters:")
-            for param in data['parameters']:
-                param_info = f"- {param.get('name', 'unknown')} ({param.get('in', 'unknown')}): {param.get('description', 'No description')}"
-                if param.get('required', False):
-                    param_info += " [Required]"
-                content_parts.append(param_info)
+            content_parts.extend(
+                f"- {param.get('name', 'unknown')} ({param.get('in', 'unknown')}): "
+                f"{param.get('description', 'No description')}{' [Required]' if param.get('required', False) else ''}"
+                for param in data['parameters']
+            )
         
         # Add response information
         if 'responses' in data:
             content_parts.append("Responses:")
-            for status_code, response_data in data['responses'].items():
-                content_parts.append(f"- {status_code}: {response_data.get('description', 'No description')}")
+            content_parts.extend(
+                f"- {status_code}: {response_data.get('description', 'No description')}"
+                for status_code, response_data in data['responses'].items()
+            )
         
         return "\n".join(content_parts)
     
@@ -267,8 +566,8 @@ class EnhancedFeasibilityAnalyzer:
         else:
             return "high"
     
-    def _populate_integration_guides(self):
-        """Populate integration guides collection"""
+    def _populate_integration_guides(self) -> List[Document]:
+        """Build integration guides collection documents"""
         print("🔧 Processing integration guides...")
         
         # TODO: This is where you'll add your first-hand integration docs
@@ -312,12 +611,10 @@ class EnhancedFeasibilityAnalyzer:
             )
             documents.append(doc)
         
-        if documents:
-            self.vector_stores["integration_guides"].add_documents(documents)
-            print(f"✅ Added {len(documents)} integration guide documents")
+        return documents
     
-    def _populate_tutorials(self):
-        """Populate tutorials and examples collection"""
+    def _populate_tutorials(self) -> List[Document]:
+        """Build tutorials and examples collection documents"""
         print("📚 Processing tutorials...")
         
         # Placeholder tutorial content
@@ -347,12 +644,10 @@ class EnhancedFeasibilityAnalyzer:
             )
             documents.append(doc)
         
-        if documents:
-            self.vector_stores["tutorials_examples"].add_documents(documents)
-            print(f"✅ Added {len(documents)} tutorial documents")
+        return documents
     
-    def _populate_glossary(self):
-        """Populate glossary and concepts collection"""
+    def _populate_glossary(self) -> List[Document]:
+        """Build glossary and concepts collection documents"""
         print("📖 Processing glossary...")
         
         # Key OneFlow concepts from the documentation
@@ -392,12 +687,10 @@ class EnhancedFeasibilityAnalyzer:
             )
             documents.append(doc)
         
-        if documents:
-            self.vector_stores["glossary_concepts"].add_documents(documents)
-            print(f"✅ Added {len(documents)} glossary documents")
+        return documents
     
-    def _populate_use_cases(self):
-        """Populate use cases and patterns collection"""
+    def _populate_use_cases(self) -> List[Document]:
+        """Build use cases and patterns collection documents"""
         print("💼 Processing use cases...")
         
         use_cases = [
@@ -436,9 +729,7 @@ class EnhancedFeasibilityAnalyzer:
             )
             documents.append(doc)
         
-        if documents:
-            self.vector_stores["use_cases_patterns"].add_documents(documents)
-            print(f"✅ Added {len(documents)} use case documents")
+        return documents
     
     def _create_fallback_api_docs(self) -> List[Document]:
         """Create fallback API documentation if processor unavailable"""
@@ -489,162 +780,218 @@ class EnhancedFeasibilityAnalyzer:
         # Step 1: Query analysis for smart routing
         query_intent = self._analyze_query_intent(question)
         
-        # Step 2: Primary targeted search
-        primary_results = self._targeted_search(question, query_intent, k//2)
-        
-        # Step 3: Cross-collection search for context
-        context_results = self._cross_collection_search(question, k//2)
+        # Embed once; every collection search below reuses the vector
+        query_embedding = self.embed_query(question)
         
-        # Step 4: Merge, deduplicate, and rank results
-        all_results = self._merge_and_rank_results(primary_results, context_results)
+        # Step 2: Targeted and cross-collection search, each collection queried once
+        hits = self._routed_search(query_embedding, query_intent, k)
         
-        return all_results[:k]
+        # Step 3: Merge, deduplicate, and rank results
+        return self._merge_and_rank_results(hits, k)
     
-    def _analyze_query_intent(self, question: str) -> Dict[str, float]:
-        """Analyze query to determine which collections are most relevant"""
-        
-        question_lower = question.lower()
-        intent_scores = {}
-        
-        # API-focused keywords
-        api_keywords = ["endpoint", "api", "parameter", "response", "request", "method", "post", "get"]
-        api_score = sum(1 for keyword in api_keywords if keyword in question_lower)
-        intent_scores["api_specifications"] = api_score
-        
-        # Integration-focused keywords  
-        integration_keywords = ["integrate", "integration", "connect", "sync", "crm", "system", "workflow"]
-        integration_score = sum(1 for keyword in integration_keywords if keyword in question_lower)
-        intent_scores["integration_guides"] = integration_score
-        
-        # Tutorial-focused keywords
-        tutorial_keywords = ["how to", "tutorial", "example", "step", "guide", "implement"]
-        tutorial_score = sum(1 for keyword in tutorial_keywords if keyword in question_lower)
-        intent_scores["tutorials_examples"] = tutorial_score
+    def embed_query(self, question: str) -> List[float]:
+        """Embed a question, reusing the vector for repeats that differ only in case or spacing"""
+        
+        key = " ".join(question.lower().split())
+        with self._embedding_cache_lock:
+            embedding = self._embedding_cache.get(key)
+            if embedding is not None:
+                self._embedding_cache.move_to_end(key)
+                return embedding
+        
+        embedding = self._stored_embedding(key)
+        if embedding is None:
+            self._embedding_rate_limiter.acquire()
+            embedding = self.embeddings.embed_query(question)
+            self._store_embedding(key, embedding)
+        
+        # The analyzer is shared across sessions, so guard the LRU bookkeeping
+        with self._embedding_cache_lock:
+            self._embedding_cache[key] = embedding
+            if len(self._embedding_cache) > EMBEDDING_CACHE_SIZE:
+                self._embedding_cache.popitem(last=False)
+        return embedding
+    
+    def _embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """Embed document texts, only sending those missing from the on-disk store to OpenAI"""
         
-        # Use case keywords
-        usecase_keywords = ["business", "scenario", "pattern", "value", "benefit", "process"]
-        usecase_score = sum(1 for keyword in usecase_keywords if keyword in question_lower)
-        intent_scores["use_cases_patterns"] = usecase_score
+        embeddings = [self._stored_embedding(text) for text in texts]
+        missing = [index for index, embedding in enumerate(embeddings) if embedding is None]
         
-        # Glossary keywords (definitions)
-        glossary_keywords = ["what is", "define", "meaning", "term", "concept"]
-        glossary_score = sum(1 for keyword in glossary_keywords if keyword in question_lower)
-        intent_scores["glossary_concepts"] = glossary_score
+        if missing:
+            # Callers pass at most EMBEDDING_BATCH_SIZE texts, which the client sends as one request
+            self._embedding_rate_limiter.acquire()
+            fresh = self.embeddings.embed_documents([texts[index] for index in missing])
+            for index, embedding in zip(missing, fresh):
+                embeddings[index] = embedding
+                self._store_embedding(texts[index], embedding)
         
-        return intent_scores
+        return embeddings
     
-    def _targeted_search(self, question: str, intent_scores: Dict[str, float], k: int) -> List[SearchResult]:
-        """Perform targeted search based on query intent"""
+    def _embedding_key(self, text: str) -> bytes:
+        """On-disk store key for a text, scoped to the embedding model and size"""
+        return hashlib.blake2b(f"{EMBEDDING_MODEL}:{EMBEDDING_DIMENSIONS}\0{text}".encode()).digest()
+    
+    def _stored_embedding(self, text: str) -> Optional[List[float]]:
+        """Embedding persisted by an earlier run, if any"""
+        if self._embedding_store is None:
+            return None
+        stored = self._embedding_store.get(self._embedding_key(text))
+        # Entries written before the packed float32 format are plain lists
+        if isinstance(stored, bytes):
+            return array('f', stored).tolist()
+        return stored
+    
+    def _store_embedding(self, text: str, embedding: List[float]):
+        """Persist an embedding so later runs skip the OpenAI call"""
+        if self._embedding_store is not None:
+            # Packed float32 bytes: OpenAI embeddings carry float32 precision, so this is
+            # lossless and far smaller than a pickled list of Python floats
+            self._embedding_store[self._embedding_key(text)] = array('f', embedding).tobytes()
+    
+    def _analyze_query_intent(self, question: str) -> Dict[str, float]:
+        """Analyze query to determine which collections are most relevant"""
         
-        results = []
+        return dict(_intent_scores(question.lower()))
+    
+    def _routed_search(self, query_embedding: List[float], intent_scores: Dict[str, float], k: int) -> List[_Hit]:
+        """Search every collection once: deeper in the two most relevant, shallower elsewhere for context"""
         
         # Sort collections by relevance score
         sorted_collections = sorted(intent_scores.items(), key=lambda x: x[1], reverse=True)
         
-        # Search top 2 most relevant collections
-        for collection_name, score in sorted_collections[:2]:
-            if score > 0:  # Only search collections with some relevance
-                try:
-                    collection_results = self.vector_stores[collection_name].similarity_search_with_score(
-                        question, k=k//2 if len(sorted_collections) > 1 else k
-                    )
-                    
-                    for doc, similarity_score in collection_results:
-                        result = SearchResult(
-                            content=doc.page_content,
-                            metadata=doc.metadata,
-                            score=similarity_score,
-                            source_type=ContentType(doc.metadata["source_type"])
-                        )
-                        results.append(result)
-                        
-                except Exception as e:
-                    print(f"Error searching {collection_name}: {e}")
+        # Half of k is targeted, split over the top 2 collections with any relevance;
+        # the other half is spread across all collections for context. A targeted
+        # collection's deeper search already contains its context hits
+        targeted_k = k//4 if len(sorted_collections) > 1 else k//2
+        context_k = max(1, (k//2) // len(self.collections))
+        
+        searches = [
+            (collection_name, max(targeted_k, context_k))
+            for collection_name, score in sorted_collections[:2] if score > 0
+        ]
+        targeted = {collection_name for collection_name, _ in searches}
+        searches.extend(
+            (collection_name, context_k)
+            for collection_name in self.collections if collection_name not in targeted
+        )
         
-        return results
+        return self._search_collections(query_embedding, searches)
     
-    def _cross_collection_search(self, question: str, k: int) -> List[SearchResult]:
-        """Search across all collections for additional context"""
+    def _search_collections(self, query_embedding: List[float], searches: List[Tuple[str, int]]) -> List[_Hit]:
+        """Run (collection, k) searches concurrently, keeping results in search order"""
         
-        results = []
-        per_collection_k = max(1, k // len(self.vector_stores))
+        batches = self._search_executor.map(
+            lambda search: self._search_collection(search[0], query_embedding, search[1]), searches
+        )
+        return [result for batch in batches for result in batch]
+    
+    def _search_collection(self, collection_name: str, query_embedding: List[float], k: int) -> List[_Hit]:
+        """Similarity search in one collection; errors are logged and yield no results"""
         
-        for collection_name, vector_store in self.vector_stores.items():
-            try:
-                collection_results = vector_store.similarity_search_with_score(
-                    question, k=per_collection_k
-                )
-                
-                for doc, similarity_score in collection_results:
-                    result = SearchResult(
-                        content=doc.page_content,
-                        metadata=doc.metadata, 
-                        score=similarity_score,
-                        source_type=ContentType(doc.metadata["source_type"])
-                    )
-                    results.append(result)
-                    
-            except Exception as e:
-                print(f"Error in cross-collection search for {collection_name}: {e}")
-        
-        return results
-    
-    def _merge_and_rank_results(self, primary: List[SearchResult], context: List[SearchResult]) -> List[SearchResult]:
-        """Merge and deduplicate results, maintaining diversity"""
-        
-        # Combine all results
-        all_results = primary + context
-        
-        # Deduplicate based on content similarity (simple approach)
-        unique_results = []
-        seen_content = set()
-        
-        for result in sorted(all_results, key=lambda x: x.score):
-            # Simple deduplication by content hash
-            content_hash = hashlib.md5(result.content.encode()).hexdigest()
-            if content_hash not in seen_content:
-                unique_results.append(result)
-                seen_content.add(content_hash)
+        try:
+            # Query Chroma directly with the precomputed embedding
+            response = self.collections[collection_name].query(
+                query_embeddings=[query_embedding],
+                n_results=k,
+                include=["documents", "metadatas", "distances"]
+            )
+            
+            # Scores are distances, as with similarity_search_with_score
+            return list(zip(response["distances"][0], response["documents"][0], response["metadatas"][0]))
+            
+        except Exception as e:
+            print(f"Error searching {collection_name}: {e}")
+            return []
+    
+    def _merge_and_rank_results(self, hits: List[_Hit], k: int) -> List[SearchResult]:
+        """Merge and deduplicate hits, maintaining diversity, into the top k results"""
+        
+        # Deduplicate in one pass, keeping the best-scored (lowest distance, then earliest)
+        # copy of each content hash
+        best_by_content = {}
+        for index, (score, content, metadata) in enumerate(hits):
+            # Simple deduplication by hash of the case- and whitespace-normalized content
+            content_hash = hashlib.blake2b(' '.join(content.lower().split()).encode(), digest_size=8).digest()
+            best = best_by_content.get(content_hash)
+            if best is None or score < best[0]:
+                best_by_content[content_hash] = (score, index, content, metadata)
         
         # Prioritize diversity - ensure we have results from different source types
-        final_results = []
-        source_type_counts = {}
-        
-        for result in unique_results:
-            source_type = result.source_type
-            if source_type_counts.get(source_type, 0) < 3:  # Max 3 per source type
-                final_results.append(result)
-                source_type_counts[source_type] = source_type_counts.get(source_type, 0) + 1
+        by_source_type = {}
+        for entry in best_by_content.values():
+            by_source_type.setdefault(entry[3]["source_type"], []).append(entry)
+        
+        final_entries = sorted(
+            entry
+            for entries in by_source_type.values()
+            for entry in heapq.nsmallest(MAX_RESULTS_PER_SOURCE_TYPE, entries)
+        )
         
-        return final_results
+        return [
+            SearchResult(
+                content=content,
+                metadata=metadata,
+                score=score,
+                source_type=ContentType(metadata["source_type"])
+            )
+            for score, _, content, metadata in final_entries[:k]
+        ]
     
     async def assess_feasibility_enhanced(self, question: str) -> EnhancedAssessment:
         """Enhanced feasibility assessment with hybrid RAG"""
         
+        # Repeat questions skip retrieval and the LLM entirely, until the API
+        # knowledge base is rebuilt; the first lookup may create the API processor,
+        # so it runs off the shared event loop
+        loop = asyncio.get_running_loop()
+        normalized = " ".join(question.lower().split())
+        api_version = await loop.run_in_executor(None, self._api_knowledge_version)
+        cache_key = hashlib.blake2b(f"{api_version}\0{normalized}".encode()).digest()
+        if self._assessment_store is not None:
+            cached = self._assessment_store.get(cache_key)
+            if cached is not None:
+                return cached
+        
         try:
-            # Hybrid search for relevant context
-            search_results = self.hybrid_search(question, k=8)
+            # Hybrid search for relevant context; it blocks on embedding and Chroma
+            # calls, so it runs in a worker thread to keep the shared event loop free
+            search_results = await loop.run_in_executor(
+                None, self.hybrid_search, question, 8
+            )
             
             if not search_results:
                 return self._create_fallback_enhanced_assessment(question)
             
             # Create enhanced prompt with multiple context types
-            enhanced_prompt = self._create_enhanced_prompt(question, search_results)
+            enhanced_messages = self._create_enhanced_prompt(question, search_results)
             
             # GPT-4o-mini assessment
-            response = await self.llm.ainvoke(enhanced_prompt.format_messages())
+            response = await self.llm.ainvoke(enhanced_messages)
             
             # Parse structured response
             assessment = self._parse_enhanced_response(response.content, search_results)
             
+            # Fallback assessments carry no sources and are never cached
+            if self._assessment_store is not None and assessment.sources:
+                self._assessment_store.set(cache_key, assessment, expire=ASSESSMENT_TTL)
+            
             return assessment
             
         except Exception as e:
-            st.error(f"Enhanced assessment failed: {e}")
+            # Runs off the script thread; the caller shows the fallback explanation
+            print(f"Enhanced assessment failed: {e}")
             return self._create_fallback_enhanced_assessment(question, str(e))
     
-    def _create_enhanced_prompt(self, question: str, results: List[SearchResult]) -> ChatPromptTemplate:
-        """Create comprehensive prompt with multiple context sources"""
+    def _api_knowledge_version(self) -> str:
+        """Modification time of the API processor's knowledge base file, or "" if there is none"""
+        if not self.use_existing_api_processor:
+            return ""
+        mtime = self.api_processor.get_knowledge_base_mtime()
+        return "" if mtime is None else repr(mtime)
+    
+    def _create_enhanced_prompt(self, question: str, results: List[SearchResult]) -> List[BaseMessage]:
+        """Create comprehensive prompt messages with multiple context sources"""
         
         # Organize results by source type
         context_by_type = {}
@@ -663,54 +1010,16 @@ class EnhancedFeasibilityAnalyzer:
         
         formatted_context = "\n".join(context_sections)
         
-        prompt_template = """You are an expert OneFlow integration consultant helping sales teams assess technical feasibility.
-
-CONTEXT FROM ONEFLOW DOCUMENTATION:
-{context}
-
-SALES QUESTION: {question}
-
-Provide a comprehensive assessment in JSON format:
-{{
-    "feasibility": "YES|NO|CONDITIONAL|NEEDS_ANALYSIS",
-    "confidence": 0.0-1.0,
-    "explanation": "Clear, business-focused explanation",
-    "api_requirements": ["Required API endpoints and methods"],
-    "integration_complexity": "LOW|MEDIUM|HIGH with detailed reasoning",
-    "business_context": "How this fits into business workflows", 
-    "caveats": ["Important limitations, dependencies, requirements"],
-    "related_endpoints": ["Relevant API endpoints from context"],
-    "integration_patterns": ["Applicable integration patterns"],
-    "implementation_steps": ["High-level implementation steps"],
-    "timeline_estimate": "Realistic development timeline",
-    "cost_implications": "Development cost considerations"
-}}
-
-GUIDELINES:
-- Use business language, avoid technical jargon
-- Be specific about API requirements and endpoints
-- Consider integration complexity realistically
-- Focus on sales impact and business value
-- Highlight any deal-breaking limitations
-- Reference specific OneFlow capabilities from context
-- Provide actionable implementation guidance"""
-
-        return ChatPromptTemplate.from_messages([
-            ("system", prompt_template),
-            ("human", "Context: {context}\n\nQuestion: {question}")
-        ]).partial(context=formatted_context, question=question)
+        return self._prompt_template.format_messages(context=formatted_context, question=question)
     
     def _parse_enhanced_response(self, response_content: str, search_results: List[SearchResult]) -> EnhancedAssessment:
         """Parse enhanced LLM response into structured assessment"""
         
         try:
-            # Extract JSON from response
-            import re
-            json_match = re.search(r'\{.*\}', response_content, re.DOTALL)
-            if json_match:
-                data = json.loads(json_match.group())
-            else:
-                raise ValueError("No JSON found in response")
+            # JSON mode guarantees the whole reply is the object
+            data = _json_loads(response_content)
+            if not isinstance(data, dict):
+                raise ValueError("No JSON object found in response")
             
             return EnhancedAssessment(
                 feasibility=data.get("feasibility", "CONDITIONAL"),
@@ -733,19 +1042,7 @@ GUIDELINES:
     def _create_fallback_enhanced_assessment(self, question: str, error: str = "") -> EnhancedAssessment:
         """Create fallback assessment when enhanced analysis fails"""
         
-        return EnhancedAssessment(
-            feasibility="NEEDS_ANALYSIS",
-            confidence=0.3,
-            explanation=f"Could not complete enhanced analysis. {error}",
-            api_requirements=["Manual review required"],
-            integration_complexity="UNKNOWN - requires detailed analysis",
-            business_context="Unable to determine without proper analysis",
-            caveats=["Enhanced analysis system unavailable", "Fallback assessment provided"],
-            related_endpoints=[],
-            integration_patterns=[],
-            implementation_steps=["Contact technical team for detailed assessment"],
-            sources=[]
-        )
+        return replace(_FALLBACK_ASSESSMENT, explanation=f"Could not complete enhanced analysis. {error}")
     
     def add_integration_documents(self, documents: List[Dict[str, Any]]):
         """
@@ -757,33 +1054,44 @@ GUIDELINES:
         
         print(f"📥 Adding {len(documents)} integration documents...")
         
+        collection_mapping = {
+            "api": "api_specifications",
+            "integration": "integration_guides", 
+            "tutorial": "tutorials_examples",
+            "glossary": "glossary_concepts",
+            "use_case": "use_cases_patterns"
+        }
+        docs_by_collection: Dict[str, List[Document]] = {}
+        
+        # Shared by every document in this batch
+        source_type = ContentType.INTEGRATION_GUIDE.value
+        added_date = datetime.now().isoformat()
+        
         for doc_data in documents:
             # Determine target collection based on document type
             doc_type = doc_data.get("type", "integration_guide")
-            collection_mapping = {
-                "api": "api_specifications",
-                "integration": "integration_guides", 
-                "tutorial": "tutorials_examples",
-                "glossary": "glossary_concepts",
-                "use_case": "use_cases_patterns"
-            }
-            
             collection_name = collection_mapping.get(doc_type, "integration_guides")
             
-            # Create document
-            doc = Document(
-                page_content=doc_data["content"],
-                metadata={
-                    "source_type": ContentType.INTEGRATION_GUIDE.value,
-                    "title": doc_data.get("title", "Untitled"),
-                    "complexity": doc_data.get("complexity", "medium"),
-                    "integration_level": doc_data.get("integration_level", "application"),
-                    "added_date": datetime.now().isoformat()
-                }
-            )
+            metadata = {
+                "source_type": source_type,
+                "title": doc_data.get("title", "Untitled"),
+                "complexity": doc_data.get("complexity", "medium"),
+                "integration_level": doc_data.get("integration_level", "application"),
+                "added_date": added_date
+            }
             
-            # Add to appropriate collection
-            self.vector_stores[collection_name].add_documents([doc])
+            # Create one document per token-bounded chunk
+            docs_by_collection.setdefault(collection_name, []).extend(
+                Document(page_content=chunk, metadata={**metadata, "chunk": index})
+                for index, chunk in enumerate(_split_into_chunks(doc_data["content"]))
+            )
+        
+        # Add to appropriate collections in one batched embedding pass
+        self._bulk_add(docs_by_collection)
+        
+        # Earlier assessments did not see the new documents
+        if self._assessment_store is not None:
+            self._assessment_store.clear()
         
         print(f"✅ Successfully added {len(documents)} documents to knowledge base")
     
@@ -5,30 +5,129 @@ Loads .doc, .docx, and .txt files into the enhanced knowledge base
 
 import os
 import sys
-from typing import List, Dict, Any
+import hashlib
+import tempfile
+import zipfile
+import xml.etree.ElementTree as ET
+from concurrent.futures import ThreadPoolExecutor
+from functools import wraps
+from typing import Callable, List, Dict, Any, Optional, Tuple
+
+# .docx files larger than this are streamed with iterparse instead of python-docx
+LARGE_DOCX_BYTES = 5 * 1024 * 1024
+
+_W = '{http://schemas.openxmlformats.org/wordprocessingml/2006/main}'
+
+# Per-file status lines collected before each write while loading a folder
+STATUS_BATCH_LINES = 256
+
+# Extracted text of parsed documents, keyed by the SHA-256 of the file bytes
+PARSE_CACHE_DIR = "./.docs_cache"
+
+# Part of every parse cache key; bump when a cached loader's output changes so
+# old entries are no longer used
+PARSE_CACHE_VERSION = 1
+
+# Bytes read per step while hashing a file for the parse cache
+HASH_CHUNK_BYTES = 1024 * 1024
+
+def _cached_by_content(loader: Callable[[str], str]) -> Callable[[str], str]:
+    """Reuse a loader's extracted text from disk while the file's bytes are unchanged"""
+    
+    @wraps(loader)
+    def cached_loader(file_path: str) -> str:
+        # Hash in chunks, so large files streamed by the loader are never held in memory
+        digest = hashlib.sha256(f"{PARSE_CACHE_VERSION}:{loader.__name__}\0".encode())
+        with open(file_path, 'rb') as f:
+            for chunk in iter(lambda: f.read(HASH_CHUNK_BYTES), b''):
+                digest.update(chunk)
+        key = digest.hexdigest()
+        cache_path = os.path.join(PARSE_CACHE_DIR, f"{key}.txt")
+        
+        try:
+            with open(cache_path, 'r', encoding='utf-8', newline='') as f:
+                return f.read()
+        except FileNotFoundError:
+            pass
+        
+        content = loader(file_path)
+        
+        # Failed parses return "" and are retried next run; write atomically since
+        # files are loaded concurrently
+        if content:
+            os.makedirs(PARSE_CACHE_DIR, exist_ok=True)
+            with tempfile.NamedTemporaryFile('w', encoding='utf-8', newline='', dir=PARSE_CACHE_DIR, delete=False) as f:
+                f.write(content)
+            os.replace(f.name, cache_path)
+        
+        return content
+    
+    return cached_loader
 
 def load_text_file(file_path: str) -> str:
     """Load content from a text file"""
+    # One read and one bulk decode; the file is not reopened to retry the encoding
+    with open(file_path, 'rb') as f:
+        data = f.read()
+    
     try:
-        with open(file_path, 'r', encoding='utf-8') as f:
-            return f.read()
+        text = data.decode('utf-8')
     except UnicodeDecodeError:
         # Try with different encoding
-        with open(file_path, 'r', encoding='latin-1') as f:
-            return f.read()
+        text = data.decode('latin-1')
+    
+    # Universal newlines, as text-mode reading gave
+    if '\r' in text:
+        text = text.replace('\r\n', '\n').replace('\r', '\n')
+    return text
 
+def _run_text(node: ET.Element) -> str:
+    """Text a run-level WordprocessingML element contributes, as python-docx renders it"""
+    tag = node.tag
+    if tag == _W + 't':
+        return node.text or ''
+    if tag == _W + 'tab':
+        return '\t'
+    if tag == _W + 'cr' or (tag == _W + 'br' and node.get(_W + 'type', 'textWrapping') == 'textWrapping'):
+        return '\n'
+    return ''
+
+def _stream_docx_text(file_path: str) -> str:
+    """Body paragraph text of a .docx, parsed incrementally without python-docx objects"""
+    paragraphs = []
+    depth = 0
+    
+    with zipfile.ZipFile(file_path) as archive, archive.open('word/document.xml') as f:
+        for event, element in ET.iterparse(f, events=('start', 'end')):
+            if event == 'start':
+                depth += 1
+                continue
+            
+            # Direct children of w:body, matching python-docx's doc.paragraphs;
+            # cleared once read so memory stays flat
+            depth -= 1
+            if depth == 2:
+                if element.tag == _W + 'p':
+                    text = ''.join(_run_text(node) for node in element.iter())
+                    if text.strip():
+                        paragraphs.append(text)
+                element.clear()
+    
+    return '\n'.join(paragraphs)
+
+@_cached_by_content
 def load_docx_file(file_path: str) -> str:
     """Load content from a .docx file"""
     try:
+        if os.path.getsize(file_path) > LARGE_DOCX_BYTES:
+            return _stream_docx_text(file_path)
+        
         from docx import Document
         doc = Document(file_path)
-        content = []
         
-        for paragraph in doc.paragraphs:
-            if paragraph.text.strip():
-                content.append(paragraph.text)
-        
-        return '\n'.join(content)
+        # Paragraph.text rebuilds the string from its runs on each access; read it once
+        texts = (paragraph.text for paragraph in doc.paragraphs)
+        return '\n'.join(text for text in texts if text.strip())
     except ImportError:
         print("❌ python-docx not installed. Run: pip install python-docx")
         return ""
@@ -49,38 +148,49 @@ def load_doc_file(file_path: str) -> str:
         print(f"❌ Error reading {file_path}: {e}")
         return ""
 
-def determine_doc_type(filename: str, content: str) -> str:
-    """Determine document type from filename and content"""
-    filename_lower = filename.lower()
-    content_lower = content.lower()
+# Loader per supported file extension
+_LOADERS = {
+    '.txt': load_text_file,
+    '.docx': load_docx_file,
+    '.doc': load_doc_file,
+    '.md': load_text_file,
+}
+
+# Classification keywords, matched as substrings of the lowercased filename/content
+_FILENAME_DOC_TYPES = (
+    ('api', ('api', 'endpoint', 'reference')),
+    ('tutorial', ('tutorial', 'guide', 'howto', 'step')),
+    ('glossary', ('glossary', 'definition', 'terms')),
+    ('use_case', ('usecase', 'use_case', 'scenario', 'example')),
+)
+_CONTENT_DOC_TYPES = (
+    ('api', ('endpoint', 'api call', 'http', 'rest')),
+    ('tutorial', ('step 1', 'first step', 'tutorial', 'how to')),
+    ('glossary', ('definition:', 'means:', 'refers to')),
+    ('use_case', ('use case', 'scenario', 'example')),
+)
+_TECHNICAL_KEYWORDS = ('api', 'endpoint', 'json', 'webhook', 'authentication', 'oauth')
+_PARTNER_KEYWORDS = ('partner', 'marketplace', 'generic')
+_APPLICATION_KEYWORDS = ('application', 'crm', 'system integration')
+
+def _doc_type(filename_lower: str, content_lower: str) -> str:
+    """Document type from the lowercased filename, then the lowercased content"""
     
     # Check filename patterns first
-    if any(keyword in filename_lower for keyword in ['api', 'endpoint', 'reference']):
-        return 'api'
-    elif any(keyword in filename_lower for keyword in ['tutorial', 'guide', 'howto', 'step']):
-        return 'tutorial'
-    elif any(keyword in filename_lower for keyword in ['glossary', 'definition', 'terms']):
-        return 'glossary'
-    elif any(keyword in filename_lower for keyword in ['usecase', 'use_case', 'scenario', 'example']):
-        return 'use_case'
+    for doc_type, keywords in _FILENAME_DOC_TYPES:
+        if any(keyword in filename_lower for keyword in keywords):
+            return doc_type
     
     # Check content patterns
-    if any(keyword in content_lower for keyword in ['endpoint', 'api call', 'http', 'rest']):
-        return 'api'
-    elif any(keyword in content_lower for keyword in ['step 1', 'first step', 'tutorial', 'how to']):
-        return 'tutorial'
-    elif any(keyword in content_lower for keyword in ['definition:', 'means:', 'refers to']):
-        return 'glossary'
-    elif any(keyword in content_lower for keyword in ['use case', 'scenario', 'example']):
-        return 'use_case'
+    for doc_type, keywords in _CONTENT_DOC_TYPES:
+        if any(keyword in content_lower for keyword in keywords):
+            return doc_type
     
     # Default to integration guide
     return 'integration'
 
-def assess_complexity(content: str) -> str:
-    """Assess document complexity based on length and content"""
-    length = len(content)
-    content_lower = content.lower()
+def _complexity(length: int, content_lower: str) -> str:
+    """Complexity from the content length and its lowercased text"""
     
     # Base complexity on length
     if length < 800:
@@ -90,9 +200,15 @@ def assess_complexity(content: str) -> str:
     else:
         base_complexity = 'high'
     
-    # Adjust based on technical content
-    technical_keywords = ['api', 'endpoint', 'json', 'webhook', 'authentication', 'oauth']
-    technical_count = sum(1 for keyword in technical_keywords if keyword in content_lower)
+    # Adjust based on technical content; each keyword is a full scan of the content,
+    # so stop once the outcome can no longer change
+    technical_count = 0
+    for scanned, keyword in enumerate(_TECHNICAL_KEYWORDS, 1):
+        if keyword in content_lower:
+            technical_count += 1
+        elif len(_TECHNICAL_KEYWORDS) - (scanned - technical_count) < 5 \
+                and (technical_count >= 2 or base_complexity != 'low'):
+            break
     
     if technical_count >= 5:
         return 'high'
@@ -101,17 +217,80 @@ def assess_complexity(content: str) -> str:
     
     return base_complexity
 
-def determine_integration_level(content: str) -> str:
-    """Determine integration level from content"""
-    content_lower = content.lower()
+def _integration_level(content_lower: str) -> str:
+    """Integration level from the lowercased content"""
     
-    if any(keyword in content_lower for keyword in ['partner', 'marketplace', 'generic']):
+    if any(keyword in content_lower for keyword in _PARTNER_KEYWORDS):
         return 'partner'
-    elif any(keyword in content_lower for keyword in ['application', 'crm', 'system integration']):
+    elif any(keyword in content_lower for keyword in _APPLICATION_KEYWORDS):
         return 'application'
     else:
         return 'standard'
 
+def determine_doc_type(filename: str, content: str) -> str:
+    """Determine document type from filename and content"""
+    return _doc_type(filename.lower(), content.lower())
+
+def assess_complexity(content: str) -> str:
+    """Assess document complexity based on length and content"""
+    return _complexity(len(content), content.lower())
+
+def determine_integration_level(content: str) -> str:
+    """Determine integration level from content"""
+    return _integration_level(content.lower())
+
+def classify(filename: str, content: str) -> Tuple[str, str, str]:
+    """Document type, complexity and integration level, lowercasing the content only once"""
+    content_lower = content.lower()
+    
+    return (
+        _doc_type(filename.lower(), content_lower),
+        _complexity(len(content), content_lower),
+        _integration_level(content_lower)
+    )
+
+def _process_file(file_path: str, file_size: Optional[int] = None) -> Tuple[Optional[Dict[str, Any]], Optional[str]]:
+    """Load and classify one file; the document is None if it is skipped or fails to load"""
+    filename = os.path.basename(file_path)
+    
+    try:
+        # Load content based on file type
+        extension = os.path.splitext(filename)[1].lower()
+        loader = _LOADERS.get(extension)
+        if loader is None:
+            return None, None
+        
+        # Under 10 bytes cannot hold 10 characters, so skip without reading; .doc
+        # files become a placeholder document whatever their size
+        if file_size is not None and file_size < 10 and extension != '.doc':
+            return None, f"⚠️ Skipping empty file: {filename}"
+        
+        content = loader(file_path)
+        stripped = content.strip() if content else ""
+        
+        # Skip empty files
+        if len(stripped) < 10:
+            return None, f"⚠️ Skipping empty file: {filename}"
+        
+        # Create document metadata
+        title = os.path.splitext(filename)[0].replace('_', ' ').replace('-', ' ').title()
+        doc_type, complexity, integration_level = classify(filename, content)
+        
+        document = {
+            "content": stripped,
+            "title": title,
+            "type": doc_type,
+            "complexity": complexity,
+            "integration_level": integration_level,
+            "filename": filename,
+            "file_size": len(content)
+        }
+        
+        return document, f"✅ Loaded: {filename} ({doc_type}, {complexity}) - {len(content)} chars"
+        
+    except Exception as e:
+        return None, f"❌ Error loading {filename}: {e}"
+
 def load_documents_from_folder(folder_path: str) -> List[Dict[str, Any]]:
     """Load all documents from a folder"""
     
@@ -121,59 +300,41 @@ def load_documents_from_folder(folder_path: str) -> List[Dict[str, Any]]:
     
     print(f"📂 Loading documents from: {folder_path}")
     
-    documents = []
-    supported_extensions = ['.txt', '.docx', '.doc', '.md']
-    
-    # Get all files in folder
-    files = [f for f in os.listdir(folder_path) if any(f.lower().endswith(ext) for ext in supported_extensions)]
+    # Get all supported files in folder. is_file() uses the type from the directory
+    # scan; on POSIX stat() still costs one syscall per file, which _process_file
+    # then reuses for its size check
+    with os.scandir(folder_path) as entries:
+        files = [
+            (entry.path, entry.stat().st_size) for entry in entries
+            if os.path.splitext(entry.name)[1].lower() in _LOADERS and entry.is_file()
+        ]
+    file_paths = [path for path, _ in files]
+    file_sizes = [size for _, size in files]
     
-    if not files:
+    if not file_paths:
         print(f"❌ No supported files found in {folder_path}")
-        print(f"   Looking for: {', '.join(supported_extensions)}")
+        print(f"   Looking for: {', '.join(_LOADERS)}")
         return []
     
-    print(f"📄 Found {len(files)} documents to process")
+    print(f"📄 Found {len(file_paths)} documents to process")
     
-    for filename in files:
-        file_path = os.path.join(folder_path, filename)
-        
-        try:
-            # Load content based on file type
-            if filename.lower().endswith('.txt', '.md'):
-                content = load_text_file(file_path)
-            elif filename.lower().endswith('.docx'):
-                content = load_docx_file(file_path)
-            elif filename.lower().endswith('.doc'):
-                content = load_doc_file(file_path)
-            else:
-                continue
-            
-            # Skip empty files
-            if not content or len(content.strip()) < 10:
-                print(f"⚠️ Skipping empty file: {filename}")
-                continue
-            
-            # Create document metadata
-            title = os.path.splitext(filename)[0].replace('_', ' ').replace('-', ' ').title()
-            doc_type = determine_doc_type(filename, content)
-            complexity = assess_complexity(content)
-            integration_level = determine_integration_level(content)
-            
-            document = {
-                "content": content.strip(),
-                "title": title,
-                "type": doc_type,
-                "complexity": complexity,
-                "integration_level": integration_level,
-                "filename": filename,
-                "file_size": len(content)
-            }
-            
-            documents.append(document)
-            print(f"✅ Loaded: {filename} ({doc_type}, {complexity}) - {len(content)} chars")
+    # Files are independent; read and parse them concurrently, keeping listing order
+    documents = []
+    status_lines = []
+    with ThreadPoolExecutor(max_workers=min(32, (os.cpu_count() or 1) * 4)) as executor:
+        for document, status in executor.map(_process_file, file_paths, file_sizes):
+            if document is not None:
+                documents.append(document)
+            if status:
+                status_lines.append(status)
             
-        except Exception as e:
-            print(f"❌ Error loading {filename}: {e}")
+            # Per-file status goes out in batches, one write each
+            if len(status_lines) >= STATUS_BATCH_LINES:
+                print('\n'.join(status_lines))
+                status_lines.clear()
+    
+    if status_lines:
+        print('\n'.join(status_lines))
     
     print(f"🎉 Successfully loaded {len(documents)} documents")
     return documents
@@ -3,12 +3,19 @@
 Simple OpenAI API test
 """
 import os
+from functools import lru_cache
 from dotenv import load_dotenv
 from openai import OpenAI
 
 load_dotenv()
 
 
+@lru_cache(maxsize=1)
+def get_client(api_key: str) -> OpenAI:
+    """OpenAI client created on first use, so repeated calls reuse its connection pool"""
+    return OpenAI(api_key=api_key)
+
+
 def test_openai():
     """Test OpenAI API with minimal request"""
     api_key = os.getenv('OPENAI_API_KEY')
@@ -20,7 +27,7 @@ def test_openai():
     print(f"🔑 API Key format: {api_key[:15]}...{api_key[-4:]}")
 
     try:
-        client = OpenAI(api_key=api_key)
+        client = get_client(api_key)
 
         # Use the cheapest model for testing
         response = client.chat.completions.create(